@@ -0,0 +1,60 @@
+from contextlib import redirect_stdout
+import io
+from pathlib import Path
+import tempfile
+from typing import Dict, Optional
+import unittest
+
+from wobsite_proc import OUTPUT_DIR_NAME, compile_wobsite
+from wobsite_proc.options import BuildOptions
+
+SITE_MANIFEST = "[site]\ntemplates = [\"templates\"]\npages = [\"pages\"]\nassets = [\"assets\"]\n"
+
+# A site in a temporary directory, with empty template, page and asset directories
+class SiteTestCase(unittest.TestCase):
+    dir: Path
+
+    def setUp(self) -> None:
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = Path(tmp.name)
+
+        for name in ["templates", "pages", "assets"]:
+            (self.dir / name).mkdir()
+        self.write({ "wobsite.toml": SITE_MANIFEST })
+
+    def write(self, files: Dict[str, str]) -> None:
+        for name, text in files.items():
+            path = self.dir / name
+            path.parent.mkdir(parents = True, exist_ok = True)
+            path.write_text(text)
+
+    # Builds the site and returns everything it printed
+    def build(self, options: Optional[BuildOptions] = None) -> str:
+        printed = io.StringIO()
+
+        with redirect_stdout(printed):
+            ok = compile_wobsite(self.dir, options)
+
+        self.assertTrue(ok, printed.getvalue())
+        return printed.getvalue()
+
+    def output(self, name: str) -> str:
+        return (self.dir / OUTPUT_DIR_NAME / name).read_text()
+
+def template(name: str, html: str) -> Dict[str, str]:
+    return {
+        f"templates/{name}.toml": f"[template]\nfile = \"{name}.html\"\nname = \"{name}\"\n",
+        f"templates/{name}.html": html
+    }
+
+def page(name: str, content: str, template: Optional[str] = None, suffix: str = ".html") -> Dict[str, str]:
+    manifest = f"[page]\nfile = \"{name}{suffix}\"\n"
+
+    if template is not None:
+        manifest += f"template = \"{template}\"\n"
+
+    return {
+        f"pages/{name}.toml": manifest,
+        f"pages/{name}{suffix}": content
+    }
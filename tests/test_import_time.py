@@ -0,0 +1,44 @@
+from pathlib import Path
+import subprocess
+import sys
+from typing import List
+import unittest
+
+from sites import SiteTestCase, page, template
+
+ROOT = Path(__file__).parent.parent
+
+# Only compiling a page, or compiling on several processes, may load these
+HEAVY_MODULES = ["lxml", "markdown_it", "multiprocessing"]
+
+# The heavy top-level packages wobsite_cli loads when run with args
+def heavy_modules(args: List[str]) -> List[str]:
+    process = subprocess.run([sys.executable, "-X", "importtime", "-m", "wobsite_cli", *args], cwd = ROOT, capture_output = True, text = True)
+
+    if process.returncode != 0:
+        raise AssertionError(f"wobsite_cli {' '.join(args)} failed:\n{process.stdout}{process.stderr}")
+
+    loaded = {
+        line.rsplit("|", 1)[1].strip().split(".")[0] for line in process.stderr.splitlines() if line.startswith("import time:")
+    }
+
+    return [m for m in HEAVY_MODULES if m in loaded]
+
+class ImportTimeTest(SiteTestCase):
+    def test_help_loads_no_heavy_modules(self) -> None:
+        self.assertEqual(heavy_modules(["--help"]), [])
+
+    def test_noop_build_loads_no_heavy_modules(self) -> None:
+        self.write({
+            **template("default", "<html><body><wobsite-page-content/></body></html>"),
+            **page("a", "<p>a</p>", "default"),
+            **page("b", "# b", "default", ".md")
+        })
+        self.build()
+
+        # The default job count is the CPU count, which may be 1, so several jobs are checked as well
+        for jobs in [[], ["-j", "2"]]:
+            self.assertEqual(heavy_modules([str(self.dir), "--incremental", *jobs]), [], jobs)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,69 @@
+import re
+from typing import List
+import unittest
+
+from sites import SiteTestCase, page, template
+from wobsite_proc import OUTPUT_DIR_NAME
+from wobsite_proc.options import BuildOptions
+
+COMPILED = re.compile(r"^\s*Compiled (?:templateless )?page (\S+)", re.MULTILINE)
+
+class IncrementalTest(SiteTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+
+        self.write({
+            **template("default", "<html><body><wobsite-page-content/></body></html>"),
+            **template("other", "<html><body><main><wobsite-page-content/></main></body></html>"),
+            **page("a", "<p>a</p>", "default"),
+            **page("b", "<p>b</p>", "other"),
+            "pages/docs/_defaults.toml": "[page]\ntemplate = \"default\"\n\n[macros]\nsection = \"Docs\"\n",
+            "pages/docs/c.md": "+++\n[page]\n+++\n# C <wobsite-macro-placeholder key=\"section\"/>\n",
+            "pages/docs/d.md": "+++\n[page]\n+++\n# D\n"
+        })
+        self.build()
+
+    # The pages an incremental build compiles, relative to the page directory
+    def compiled(self) -> List[str]:
+        printed = self.build(BuildOptions(incremental = True))
+        pages_dir = str(self.dir / "pages") + "/"
+
+        return sorted(p.removeprefix(pages_dir) for p in COMPILED.findall(printed))
+
+    def test_unchanged_pages_are_skipped(self) -> None:
+        self.assertEqual(self.compiled(), [])
+
+    def test_full_build_compiles_every_page(self) -> None:
+        self.assertEqual(len(COMPILED.findall(self.build())), 4)
+
+    def test_changed_content(self) -> None:
+        self.write({ "pages/a.html": "<p>changed</p>" })
+
+        self.assertEqual(self.compiled(), ["a.toml"])
+        self.assertIn("<p>changed</p>", self.output("a.html"))
+
+    def test_changed_template(self) -> None:
+        self.write({ "templates/other.html": "<html><body><article><wobsite-page-content/></article></body></html>" })
+
+        self.assertEqual(self.compiled(), ["b.toml"])
+
+    def test_changed_front_matter(self) -> None:
+        self.write({ "pages/docs/c.md": "+++\n[page]\n\n[macros]\nsection = \"Own\"\n+++\n# C <wobsite-macro-placeholder key=\"section\"/>\n" })
+
+        self.assertEqual(self.compiled(), ["docs/c.md"])
+        self.assertIn("C Own", self.output("docs/c.html"))
+
+    def test_changed_defaults(self) -> None:
+        self.write({ "pages/docs/_defaults.toml": "[page]\ntemplate = \"other\"\n\n[macros]\nsection = \"Guides\"\n" })
+
+        self.assertEqual(self.compiled(), ["docs/c.md", "docs/d.md"])
+        self.assertIn("<main>", self.output("docs/d.html"))
+        self.assertIn("C Guides", self.output("docs/c.html"))
+
+    def test_removed_output_is_rebuilt(self) -> None:
+        (self.dir / OUTPUT_DIR_NAME / "b.html").unlink()
+
+        self.assertEqual(self.compiled(), ["b.toml"])
+
+if __name__ == "__main__":
+    unittest.main()
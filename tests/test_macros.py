@@ -0,0 +1,22 @@
+import unittest
+
+from sites import SiteTestCase, page, template
+
+TEMPLATE = "<html><body><wobsite-macro-placeholder key=\"missing\"/><wobsite-page-content/></body></html>"
+
+class MacroTest(SiteTestCase):
+    def test_undefined_macro_warns_for_every_page(self) -> None:
+        self.write({
+            **template("default", TEMPLATE),
+            **page("a", "<p>a</p>", "default"),
+            **page("b", "<p>b</p>", "default"),
+            **page("c", "<p>c</p>", "default")
+        })
+
+        printed = self.build()
+
+        self.assertEqual(printed.count("Warning: Macro missing is not defined"), 3)
+        self.assertIn("<body>missing<", self.output("c.html"))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,52 @@
+from typing import Any, Dict
+import unittest
+
+from lxml import etree, html
+
+from wobsite_proc.markdown import MarkdownRenderer, TreeBuilder
+
+# Markdown without raw HTML, which is built into a tree straight from the token stream
+SOURCES = [
+    "",
+    "Plain text",
+    "# Heading\n\nSome *emphasis*, **strong** and `code` & more",
+    "Line one\nline two  \nline three\\\nline four",
+    "[link](https://example.com \"Title\") and <https://example.com/auto>",
+    "![An *emphasised* alt](image.png \"Title\")",
+    "Reference [link][ref]\n\n[ref]: /target \"Ref title\"",
+    "- tight\n- list\n  - nested\n\n1. loose\n\n2. ordered",
+    "3. starts\n4. at three",
+    "> quoted\n> text\n>\n> - with a list",
+    "```python\ndef f() -> None:\n    pass\n```\n\n    indented code\n\nafter",
+    "para\n```\nfence right after\n```",
+    "Entities &amp; &copy; &#35; and \\*escapes\\*",
+    "***\n\nSetext\n======\n\n---",
+    "- a\n\n      code in item\n- b"
+]
+
+class TreeBuilderTest(unittest.TestCase):
+    def test_matches_parsing_the_rendered_html(self) -> None:
+        md = MarkdownRenderer().md
+
+        for source in SOURCES:
+            with self.subTest(source = source):
+                env: Dict[str, Any] = {}
+                tokens = md.parse(source, env)
+
+                builder = TreeBuilder(html.Element("div"))
+                builder.block(tokens, md, env)
+
+                parsed = html.fragment_fromstring(md.renderer.render(tokens, md.options, env), create_parent = "div") # type: ignore
+                self.assertEqual(etree.tostring(builder.root), etree.tostring(parsed))
+
+    def test_raw_html_is_parsed(self) -> None:
+        renderer = MarkdownRenderer()
+        source = "<div>\n\n*inside*\n\n</div>\n\nText with <b>inline</b> HTML"
+
+        rendered = renderer.render(source, "div")
+        parsed = html.fragment_fromstring(renderer.md.render(source), create_parent = "div") # type: ignore
+
+        self.assertEqual(etree.tostring(rendered), etree.tostring(parsed))
+
+if __name__ == "__main__":
+    unittest.main()
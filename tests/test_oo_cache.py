@@ -0,0 +1,65 @@
+from dataclasses import dataclass
+from pathlib import Path
+import tempfile
+from typing import Any, cast
+import unittest
+import warnings
+
+from wobsite_oo.compiler import AssembleTuple, BaseTarget, Evaluation, ParsedTemplate, ValueLeaf
+from wobsite_oo.compiler.cache import ResultCache
+from wobsite_oo.compiler.formats.page import ParseHtmlPage
+from wobsite_oo.compiler.formats.template import ParseHtmlTemplate
+from wobsite_oo.compiler.generate import GenerationContext, GeneratePage
+
+PAGE = "<wobsite-page template=\"default\"></wobsite-page><p>Same content</p>"
+TEMPLATE = "<html><body><wobsite-page-placeholder></wobsite-page-placeholder></body></html>"
+
+@dataclass
+class OutputDirContext(GenerationContext):
+    output_dir: Path = Path("")
+
+    def get_output_dir(self) -> Path:
+        return self.output_dir
+
+class ResultCacheTest(unittest.TestCase):
+    dir: Path
+
+    def setUp(self) -> None:
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = Path(tmp.name)
+
+        for name in ["a.html", "b.html"]:
+            (self.dir / name).write_text(PAGE)
+        (self.dir / "template.html").write_text(TEMPLATE)
+
+    def generate(self, ctx: GenerationContext, name: str) -> Path:
+        # Target outputs are invariant, so the template is widened to the optional template GeneratePage takes
+        template = cast(BaseTarget[GenerationContext, Any, ParsedTemplate | None], ParseHtmlTemplate(ValueLeaf(self.dir / "template.html")))
+        target = GeneratePage(AssembleTuple(ParseHtmlPage(ValueLeaf(self.dir / name)), template))
+
+        # lxml warns about the truth value of the page meta element
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", FutureWarning)
+            return target.resolve(ctx).path
+
+    def context(self, output_dir: Path = Path("")) -> OutputDirContext:
+        return OutputDirContext(output_dir = output_dir, evaluation = Evaluation(ResultCache(self.dir / "cache")))
+
+    def test_identical_pages_keep_their_paths(self) -> None:
+        for ctx in [self.context(), self.context()]:
+            self.assertEqual(self.generate(ctx, "a.html"), self.dir / "a.html")
+            self.assertEqual(self.generate(ctx, "b.html"), self.dir / "b.html")
+
+        self.assertEqual(ctx.evaluation.cache_hits, 2)
+
+    def test_output_dir_changes_the_key(self) -> None:
+        self.generate(self.context(Path("one")), "a.html")
+
+        ctx = self.context(Path("two"))
+        self.generate(ctx, "a.html")
+
+        self.assertEqual(ctx.evaluation.cache_hits, 0)
+
+if __name__ == "__main__":
+    unittest.main()
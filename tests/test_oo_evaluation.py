@@ -0,0 +1,37 @@
+from typing import Any, override
+import unittest
+
+from wobsite_oo.compiler import AssembleTuple, BaseTarget, EvaluationContext, ValueLeaf
+
+class Add(BaseTarget[EvaluationContext, int, int]):
+    amount: int
+
+    def __init__(self, amount: int, input: BaseTarget[EvaluationContext, Any, int]) -> None:
+        self.amount = amount
+        super().__init__(input)
+
+    @override
+    def _resolve(self, input: int, ctx: EvaluationContext) -> int:
+        return input + self.amount
+
+class EvaluationTest(unittest.TestCase):
+    def test_targets_with_state_are_not_shared(self) -> None:
+        leaf = ValueLeaf[EvaluationContext, int](1)
+        target = AssembleTuple(Add(1, leaf), Add(2, leaf))
+
+        self.assertEqual(target.resolve(EvaluationContext()), (2, 3))
+
+    def test_equal_values_of_different_types_are_not_shared(self) -> None:
+        ctx = EvaluationContext()
+        values = [ValueLeaf[EvaluationContext, Any](v).resolve(ctx) for v in [1, True, 1.0]]
+
+        self.assertEqual([type(v) for v in values], [int, bool, float])
+
+    def test_unhashable_values_are_kept_by_identity(self) -> None:
+        value = (1, [2])
+        leaf = ValueLeaf[EvaluationContext, Any](value)
+
+        self.assertIs(leaf.resolve(EvaluationContext()), value)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,73 @@
+import shutil
+from typing import Dict
+import unittest
+from unittest import mock
+
+from sites import SiteTestCase, page, template
+from wobsite_proc import CACHE_DIR_NAME, OUTPUT_DIR_NAME
+from wobsite_proc.options import BuildOptions
+
+DEFAULT_TEMPLATE = """<!DOCTYPE html>
+<html>
+    <head><title><wobsite-macro-placeholder key="title"/></title><link href="style.css" rel="stylesheet"></head>
+    <body>
+        <h1><wobsite-macro-placeholder key="title"/> - <wobsite-macro-placeholder key="site"/></h1> tail
+        <img src="logo.png" alt="">
+        <!-- comment -->
+        <wobsite-page-content/>
+        <p>&copy; <wobsite-macro-placeholder key="missing"/>!</p>
+    </body>
+</html>
+"""
+
+class SkeletonTest(SiteTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+
+        self.write({
+            "wobsite.toml": "[site]\ntemplates = [\"templates\"]\npages = [\"pages\"]\nassets = [\"assets\"]\n\n[macros]\nsite = \"Site & co\"\ntitle = \"Site title\"\n",
+            "templates/default.toml": "[template]\nfile = \"default.html\"\nname = \"default\"\n\n[macros]\ntitle = \"Template <title>\"\n",
+            "templates/default.html": DEFAULT_TEMPLATE,
+            **template("bare", "<wobsite-page-content/>"),
+            **template("empty", "<html><body><p>No content</p></body></html>"),
+            **page("a", "<p>Page <b>a</b> &amp; <wobsite-macro-placeholder key=\"site\"/> after</p>", "default"),
+            "pages/b.md": "+++\n[page]\ntemplate = \"default\"\n\n[macros]\ntitle = \"B <&>\"\n+++\n# B\n\nText  \nwith ![logo](logo.png)\n",
+            "pages/sub/c.html": "+++\n[page]\ntemplate = \"default\"\n+++\n<p><a href=\"../style.css\">style</a> <img src=\"/logo.png\"></p>",
+            **page("d", "<p>Bare <wobsite-macro-placeholder key=\"title\"/></p>", "bare"),
+            **page("e", "<p>Dropped</p>", "empty"),
+            **page("f", "<p>Templateless</p>"),
+            "assets/style.css": "body { color: red; }\n",
+            "assets/logo.png": "not really a png\n"
+        })
+
+    def outputs(self) -> Dict[str, bytes]:
+        output_dir = self.dir / OUTPUT_DIR_NAME
+        return { p.relative_to(output_dir).as_posix(): p.read_bytes() for p in sorted(output_dir.rglob("*")) if p.is_file() }
+
+    def clean(self) -> None:
+        for name in [OUTPUT_DIR_NAME, CACHE_DIR_NAME]:
+            shutil.rmtree(self.dir / name, ignore_errors = True)
+
+    def test_skeleton_matches_dom(self) -> None:
+        for options in [BuildOptions(), BuildOptions(minify = True, asset_hash = True)]:
+            with self.subTest(options = options):
+                self.clean()
+                self.build(options)
+                skeleton = self.outputs()
+
+                self.clean()
+                with mock.patch("wobsite_proc.template.compile_skeleton", return_value = None) as compile_skeleton:
+                    self.build(options)
+                compile_skeleton.assert_called()
+
+                self.assertEqual(self.outputs(), skeleton)
+
+    def test_page_macros_take_precedence(self) -> None:
+        self.build()
+
+        self.assertIn("<title>B &lt;&amp;&gt;</title>", self.output("b.html"))
+        self.assertIn("<title>Template &lt;title&gt;</title>", self.output("a.html"))
+        self.assertIn("Site &amp; co after", self.output("a.html"))
+
+if __name__ == "__main__":
+    unittest.main()
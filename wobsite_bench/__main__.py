@@ -0,0 +1,161 @@
+from dataclasses import asdict
+import json
+from pathlib import Path
+import sys
+import tempfile
+from os import path
+
+from argparse import ArgumentParser
+
+sys.path.append(path.join(path.dirname(__file__), path.pardir))
+
+from wobsite_bench import importtime, synthetic
+from wobsite_bench.runner import ENGINES, BenchResult, run
+
+parser = ArgumentParser(
+    description="Benchmark the wobsite build engines against a synthetic site"
+)
+
+defaults = synthetic.SiteSpec()
+
+parser.add_argument("--pages", type = int, default = defaults.pages, help = f"Number of pages (default: {defaults.pages})")
+parser.add_argument("--templates", type = int, default = defaults.templates, help = f"Number of templates (default: {defaults.templates})")
+parser.add_argument("--page-size", type = int, default = defaults.page_size, help = f"Approximate page content size in bytes (default: {defaults.page_size})")
+parser.add_argument("--depth", type = int, default = defaults.depth, help = f"Directory nesting depth of pages and assets (default: {defaults.depth})")
+parser.add_argument("--assets", type = int, default = defaults.assets, help = f"Number of assets (default: {defaults.assets})")
+parser.add_argument("--asset-size", type = int, default = defaults.asset_size, help = f"Size of each asset in bytes (default: {defaults.asset_size})")
+parser.add_argument("--seed", type = int, default = defaults.seed, help = "Seed for the generated content")
+
+parser.add_argument(
+    "--engines",
+    nargs = "+",
+    choices = ENGINES,
+    default = ENGINES,
+    help = "Engines to benchmark (default: all)"
+)
+
+parser.add_argument("-j", "--jobs", type = int, default = 1, help = "Worker count passed to the engines (default: 1)")
+parser.add_argument("--repeat", type = int, default = 3, help = "Runs per engine, the fastest is reported (default: 3)")
+
+parser.add_argument(
+    "--import-time",
+    action = "store_true",
+    help = "Also time wobsite_cli --help and a no-change incremental build in fresh interpreters, with -X importtime"
+)
+
+parser.add_argument(
+    "--site",
+    type = Path,
+    help = "Generate the site into this directory and keep it, instead of a temporary directory"
+)
+
+parser.add_argument("--save-baseline", type = Path, metavar = "FILE", help = "Write the results to FILE as JSON")
+parser.add_argument("--baseline", type = Path, metavar = "FILE", help = "Compare the results against a baseline written by --save-baseline")
+
+parser.add_argument(
+    "--threshold",
+    type = float,
+    default = 0.1,
+    help = "Relative throughput drop or peak memory growth reported as a regression (default: 0.1)"
+)
+
+args = parser.parse_args()
+
+spec = synthetic.SiteSpec(
+    pages = args.pages,
+    templates = args.templates,
+    page_size = args.page_size,
+    depth = args.depth,
+    assets = args.assets,
+    asset_size = args.asset_size,
+    seed = args.seed
+)
+
+def bench(site_dir: Path) -> tuple[list[BenchResult], list[importtime.ImportResult]]:
+    print(f"Generating {spec.pages} page(s) in {site_dir}")
+    synthetic.generate(spec, site_dir)
+
+    results: list[BenchResult] = []
+    for engine in args.engines:
+        print(f"Running {engine}")
+        results.append(run(engine, site_dir, spec.pages, args.jobs, args.repeat))
+
+    import_results: list[importtime.ImportResult] = []
+    if args.import_time:
+        for case in importtime.CASES:
+            print(f"Running {case}")
+            import_results.append(importtime.run(case, site_dir, args.repeat))
+
+    return results, import_results
+
+if args.site is not None:
+    args.site.mkdir(parents = True, exist_ok = True)
+    results, import_results = bench(args.site.resolve())
+else:
+    with tempfile.TemporaryDirectory() as tmp:
+        results, import_results = bench(Path(tmp))
+
+print(f"{'engine':<18} {'seconds':>10} {'pages/s':>10} {'peak RSS MiB':>14}")
+for r in results:
+    print(f"{r.engine:<18} {r.seconds:>10.3f} {r.pages_per_sec:>10.1f} {r.peak_rss_kb / 1024:>14.1f}")
+
+if import_results:
+    print(f"{'case':<18} {'seconds':>10} {'imports ms':>10}  heavy modules")
+    for i in import_results:
+        print(f"{i.case:<18} {i.seconds:>10.3f} {i.import_us / 1000:>10.1f}  {', '.join(i.heavy_modules) or '-'}")
+
+if args.save_baseline is not None:
+    with args.save_baseline.open("wt") as file:
+        json.dump({
+            "spec": asdict(spec),
+            "jobs": args.jobs,
+            "results": [asdict(r) for r in results],
+            "import_results": [asdict(i) for i in import_results]
+        }, file, indent = 4)
+
+regressed = False
+if args.baseline is not None:
+    with args.baseline.open("rb") as file:
+        baseline = json.load(file)
+
+    if baseline["spec"] != asdict(spec) or baseline["jobs"] != args.jobs:
+        print("Warning: baseline was recorded with different site parameters or job count")
+
+    previous = { r["engine"]: r for r in baseline["results"] }
+
+    for r in results:
+        if r.engine not in previous:
+            continue
+
+        b = previous[r.engine]
+
+        if r.pages_per_sec < b["pages_per_sec"] * (1 - args.threshold):
+            print(f"Regression: {r.engine} throughput {r.pages_per_sec:.1f} pages/s, baseline {b['pages_per_sec']:.1f} pages/s")
+            regressed = True
+
+        if r.peak_rss_kb > b["peak_rss_kb"] * (1 + args.threshold):
+            print(f"Regression: {r.engine} peak RSS {r.peak_rss_kb / 1024:.1f} MiB, baseline {b['peak_rss_kb'] / 1024:.1f} MiB")
+            regressed = True
+
+    previous_imports = { i["case"]: i for i in baseline.get("import_results", []) }
+
+    for i in import_results:
+        if i.case not in previous_imports:
+            continue
+
+        b = previous_imports[i.case]
+
+        if i.seconds > b["seconds"] * (1 + args.threshold):
+            print(f"Regression: {i.case} took {i.seconds:.3f} s, baseline {b['seconds']:.3f} s")
+            regressed = True
+
+        # Loading a library the baseline did not is reported however little time it takes on this machine
+        added = [m for m in i.heavy_modules if m not in b["heavy_modules"]]
+        if added:
+            print(f"Regression: {i.case} imports {', '.join(added)}, baseline does not")
+            regressed = True
+
+    if not regressed:
+        print("No regressions against baseline")
+
+sys.exit(1 if regressed else 0)
@@ -0,0 +1,78 @@
+from dataclasses import dataclass, field
+from pathlib import Path
+import subprocess
+import sys
+import time
+from typing import Callable, Dict, Final, List, Tuple
+
+CASES: Final[List[str]] = ["cli-help", "cli-noop"]
+
+# Modules that only compiling a page, or compiling on several processes, should load
+HEAVY_MODULES: Final[List[str]] = ["lxml", "markdown_it", "multiprocessing"]
+
+CLI_DIR: Final[Path] = Path(__file__).parent.parent / "wobsite_cli"
+
+@dataclass
+class ImportResult:
+    case: str
+    seconds: float
+    # Cumulative import time of every top-level import, as reported by -X importtime
+    import_us: int
+    heavy_modules: List[str] = field(default_factory = lambda: [])
+
+def run(case: str, site_dir: Path, repeat: int) -> ImportResult:
+    args = __CASES[case](site_dir)
+    best = float("inf")
+    import_us = 0
+    heavy: List[str] = []
+
+    for _ in range(repeat):
+        start = time.perf_counter()
+        process = subprocess.run([sys.executable, "-X", "importtime", str(CLI_DIR), *args], capture_output = True, text = True)
+        seconds = time.perf_counter() - start
+
+        if process.returncode != 0:
+            raise Exception(f"wobsite_cli {' '.join(args)} failed:\n{process.stdout}{process.stderr}")
+
+        if seconds < best:
+            best = seconds
+            import_us, heavy = __parse(process.stderr)
+
+    return ImportResult(case = case, seconds = best, import_us = import_us, heavy_modules = heavy)
+
+# Sums the top-level cumulative times and collects the heavy top-level packages that were loaded
+def __parse(output: str) -> Tuple[int, List[str]]:
+    total = 0
+    loaded: List[str] = []
+
+    for line in output.splitlines():
+        if not line.startswith("import time:"):
+            continue
+
+        _, cumulative, name = line[len("import time:"):].split("|", 2)
+
+        if not cumulative.strip().isdigit():
+            continue
+
+        package = name.strip().split(".")[0]
+        if package in HEAVY_MODULES and package not in loaded:
+            loaded.append(package)
+
+        # Nested imports are indented by two spaces per level
+        if len(name) - len(name.lstrip()) == 1:
+            total += int(cumulative)
+
+    return total, sorted(loaded)
+
+def __help(site_dir: Path) -> List[str]:
+    return ["--help"]
+
+# A no-change build: the site is built once so that every page is skipped
+def __noop(site_dir: Path) -> List[str]:
+    subprocess.run([sys.executable, str(CLI_DIR), str(site_dir), "--full"], capture_output = True, check = True)
+    return [str(site_dir), "--incremental"]
+
+__CASES: Final[Dict[str, Callable[[Path], List[str]]]] = {
+    "cli-help": __help,
+    "cli-noop": __noop
+}
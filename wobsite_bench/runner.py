@@ -0,0 +1,130 @@
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
+from dataclasses import dataclass
+import multiprocessing
+import os
+from pathlib import Path
+import shutil
+import time
+from typing import Any, Callable, Dict, Final, List, Tuple, cast
+
+ENGINES: Final[List[str]] = ["proc", "proc-incremental", "oo"]
+
+@dataclass
+class BenchResult:
+    engine: str
+    pages: int
+    seconds: float
+    pages_per_sec: float
+    peak_rss_kb: int
+
+def run(engine: str, site_dir: Path, pages: int, jobs: int, repeat: int) -> BenchResult:
+    # Each case runs in a fresh interpreter so that peak RSS is not inherited from earlier cases
+    with ProcessPoolExecutor(max_workers = 1, mp_context = multiprocessing.get_context("spawn")) as executor:
+        return executor.submit(run_case, engine, site_dir, pages, jobs, repeat).result()
+
+def run_case(engine: str, site_dir: Path, pages: int, jobs: int, repeat: int) -> BenchResult:
+    from wobsite_proc import memory
+
+    best = float("inf")
+
+    with open(os.devnull, "wt") as devnull, redirect_stdout(devnull):
+        setup, build = __ENGINES[engine](site_dir, jobs)
+
+        for _ in range(repeat):
+            setup()
+            start = time.perf_counter()
+            build()
+            best = min(best, time.perf_counter() - start)
+
+    return BenchResult(
+        engine = engine,
+        pages = pages,
+        seconds = best,
+        pages_per_sec = pages / best if best > 0 else 0,
+        peak_rss_kb = memory.peak_rss() // 1024
+    )
+
+type Engine = Tuple[Callable[[], None], Callable[[], None]]
+
+def __clean(site_dir: Path) -> None:
+    from wobsite_proc import CACHE_DIR_NAME, OUTPUT_DIR_NAME
+
+    shutil.rmtree(site_dir / OUTPUT_DIR_NAME, ignore_errors = True)
+    shutil.rmtree(site_dir / CACHE_DIR_NAME, ignore_errors = True)
+
+def __proc(site_dir: Path, jobs: int) -> Engine:
+    from wobsite_proc import compile_wobsite
+    from wobsite_proc.options import BuildOptions
+
+    def build() -> None:
+        if not compile_wobsite(site_dir, BuildOptions(jobs = jobs)):
+            raise Exception(f"Compiling {site_dir} failed")
+
+    return (lambda: __clean(site_dir)), build
+
+def __proc_incremental(site_dir: Path, jobs: int) -> Engine:
+    from wobsite_proc import compile_wobsite
+    from wobsite_proc.options import BuildOptions
+
+    __clean(site_dir)
+    compile_wobsite(site_dir, BuildOptions(jobs = jobs))
+
+    def build() -> None:
+        if not compile_wobsite(site_dir, BuildOptions(incremental = True, jobs = jobs)):
+            raise Exception(f"Compiling {site_dir} failed")
+
+    return (lambda: None), build
+
+def __oo(site_dir: Path, jobs: int) -> Engine:
+    from lxml import etree
+
+    from wobsite_oo.compiler import (
+        Artifact, AssembleTuple, BaseTarget, OutputPage, ParsedTemplate, Process, RootTarget, RunParallel, RunSynchronous, ValueLeaf, WriteArtifact
+    )
+    from wobsite_oo.compiler.formats.page import ParseHtmlPage
+    from wobsite_oo.compiler.formats.template import ParseHtmlTemplate
+    from wobsite_oo.compiler.generate import GenerationContext, GeneratePage
+
+    output_dir = site_dir / ".oo-output"
+
+    class Bytes(Artifact):
+        data: bytes
+
+        def __init__(self, data: bytes) -> None:
+            self.data = data
+
+        def write_to(self, path: Path) -> None:
+            path.parent.mkdir(parents = True, exist_ok = True)
+            path.write_bytes(self.data)
+
+    def build() -> None:
+        templates = sorted((site_dir / "templates").glob("*.html"))
+        roots: List[RootTarget[GenerationContext, Any]] = []
+
+        for i, p in enumerate(sorted((site_dir / "pages").glob("**/*.html"))):
+            opath = output_dir / p.relative_to(site_dir / "pages")
+
+            # Target outputs are invariant, so the template is widened to the optional template GeneratePage takes
+            template = cast(
+                BaseTarget[GenerationContext, Any, ParsedTemplate | None],
+                ParseHtmlTemplate(ValueLeaf(templates[i % len(templates)]))
+            )
+            generate = GeneratePage(AssembleTuple(ParseHtmlPage(ValueLeaf(p)), template))
+
+            def to_bytes(o: OutputPage, opath: Path = opath) -> Tuple[Bytes, Path]:
+                return Bytes(etree.tostring(o.content, method = "html")), opath
+
+            roots.append(WriteArtifact(Process(to_bytes, generate)))
+
+        leaf = ValueLeaf[GenerationContext, List[RootTarget[GenerationContext, Any]]](roots)
+        runner: BaseTarget[GenerationContext, Any, None] = RunSynchronous(leaf) if jobs <= 1 else RunParallel(leaf, jobs)
+        runner.resolve(GenerationContext())
+
+    return (lambda: shutil.rmtree(output_dir, ignore_errors = True)), build
+
+__ENGINES: Final[Dict[str, Callable[[Path, int], Engine]]] = {
+    "proc": __proc,
+    "proc-incremental": __proc_incremental,
+    "oo": __oo
+}
@@ -0,0 +1,108 @@
+from dataclasses import dataclass
+from pathlib import Path
+import random
+from typing import Final, List, LiteralString
+
+WORDS: Final[List[LiteralString]] = (
+    "lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod tempor incididunt ut labore et dolore "
+    "magna aliqua enim ad minim veniam quis nostrud exercitation ullamco laboris nisi aliquip ex ea commodo consequat"
+).split()
+
+@dataclass
+class SiteSpec:
+    pages: int = 1000
+    templates: int = 4
+    page_size: int = 2048
+    depth: int = 2
+    fanout: int = 10
+    assets: int = 50
+    asset_size: int = 16 * 1024
+    seed: int = 0
+
+def generate(spec: SiteSpec, dir: Path) -> None:
+    rng = random.Random(spec.seed)
+
+    (dir / "wobsite.toml").write_text(
+        "[site]\n"
+        "templates = [\"templates\"]\n"
+        "pages = [\"pages\"]\n"
+        "assets = [\"assets\"]\n"
+    )
+
+    templates = dir / "templates"
+    templates.mkdir(parents = True)
+    for t in range(spec.templates):
+        (templates / f"t{t}.toml").write_text(f"[template]\nfile = \"t{t}.html\"\nname = \"t{t}\"\n")
+        # Carries the page placeholders of both wobsite_proc and wobsite_oo so either engine can build the site
+        (templates / f"t{t}.html").write_text(__template(t, rng))
+
+    pages = dir / "pages"
+    for i in range(spec.pages):
+        rdir = __nested_dir(i, spec)
+        (pages / rdir).mkdir(parents = True, exist_ok = True)
+
+        # Page content files are resolved relative to the page directory, not the manifest
+        file = (rdir / f"p{i}.html").as_posix()
+        (pages / rdir / f"p{i}.toml").write_text(f"[page]\nfile = \"{file}\"\ntemplate = \"t{i % max(1, spec.templates)}\"\n")
+        (pages / rdir / f"p{i}.html").write_text(__page(i, spec.page_size, rng))
+
+    assets = dir / "assets"
+    assets.mkdir(parents = True)
+    for i in range(spec.assets):
+        rdir = __nested_dir(i, spec)
+        (assets / rdir).mkdir(parents = True, exist_ok = True)
+        (assets / rdir / f"a{i}.bin").write_bytes(rng.randbytes(spec.asset_size))
+
+def __nested_dir(index: int, spec: SiteSpec) -> Path:
+    return Path(*[f"d{(index // spec.fanout ** (k + 1)) % spec.fanout}" for k in range(spec.depth)])
+
+def __sentence(rng: random.Random) -> str:
+    return " ".join(rng.choices(WORDS, k = rng.randint(6, 18))).capitalize() + "."
+
+def __page(index: int, size: int, rng: random.Random) -> str:
+    parts = [f"<h1>Page {index}</h1>"]
+    length = len(parts[0])
+
+    while length < size:
+        kind = rng.random()
+
+        if kind < 0.1:
+            part = f"<h2>{__sentence(rng)}</h2>"
+        elif kind < 0.2:
+            part = "<ul>" + "".join(f"<li>{__sentence(rng)}</li>" for _ in range(rng.randint(2, 5))) + "</ul>"
+        elif kind < 0.3:
+            part = f"<p><a href=\"p{rng.randrange(1_000_000)}.html\">{__sentence(rng)}</a> <img src=\"a{rng.randrange(100)}.bin\" alt=\"\"/></p>"
+        else:
+            part = "<p>" + " ".join(__sentence(rng) for _ in range(rng.randint(2, 6))) + "</p>"
+
+        parts.append(part)
+        length += len(part)
+
+    return "\n".join(parts) + "\n"
+
+def __template(index: int, rng: random.Random) -> str:
+    nav = "\n".join(f"                <li><a href=\"p{i}.html\">{rng.choice(WORDS)}</a></li>" for i in range(8))
+
+    return f"""<!DOCTYPE html>
+<html lang="en">
+    <head>
+        <meta charset="utf-8" />
+        <meta name="viewport" content="width=device-width, initial-scale=1.0" />
+        <title>Template {index}</title>
+    </head>
+    <body>
+        <nav>
+            <ul>
+{nav}
+            </ul>
+        </nav>
+        <main>
+            <wobsite-page-content></wobsite-page-content>
+            <wobsite-page-placeholder></wobsite-page-placeholder>
+        </main>
+        <footer>
+            <p>{__sentence(rng)}</p>
+        </footer>
+    </body>
+</html>
+"""
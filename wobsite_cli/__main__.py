@@ -1,12 +1,23 @@
 from pathlib import Path
+import os
 import sys
 from os import path
 
-from argparse import ArgumentParser
+from argparse import ArgumentParser, ArgumentTypeError
 
 sys.path.append(path.join(path.dirname(__file__), path.pardir))
 
 import wobsite_proc
+from wobsite_proc.assets import LINK_MODES
+from wobsite_proc.compress import DEFAULT_LEVEL, DEFAULT_MIN_SIZE
+from wobsite_proc.options import BuildOptions
+from wobsite_proc.shard import Shard, parse as parse_shard
+
+def shard_argument(text: str) -> Shard:
+    try:
+        return parse_shard(text)
+    except ValueError as e:
+        raise ArgumentTypeError(str(e))
 
 parser = ArgumentParser(
     description="A dumb static site generator"
@@ -14,11 +25,214 @@ parser = ArgumentParser(
 
 parser.add_argument(
     "directory",
+    nargs = "?",
     help="The website directory (folder containing wobsite.toml)"
 )
 
+command = parser.add_mutually_exclusive_group()
+
+command.add_argument(
+    "--deps",
+    nargs = "+",
+    type = Path,
+    metavar = "FILE",
+    help = "Instead of building, list the outputs affected by changes to the given files, as recorded by the last build (default website directory: the nearest directory above the first file containing wobsite.toml)"
+)
+
+command.add_argument(
+    "--merge",
+    action = "store_true",
+    help = "Instead of building, combine the output directories of a complete set of --shard builds into .output, placing changed outputs as set by --asset-link"
+)
+
+mode = parser.add_mutually_exclusive_group()
+
+mode.add_argument(
+    "--incremental",
+    dest = "incremental",
+    action = "store_true",
+    help = "Only recompile pages whose inputs changed since the last build"
+)
+
+mode.add_argument(
+    "--full",
+    dest = "incremental",
+    action = "store_false",
+    help = "Recompile every page regardless of the previous build (default)"
+)
+
+parser.add_argument(
+    "-j", "--jobs",
+    type = int,
+    default = os.cpu_count() or 1,
+    help = "Number of worker processes used to compile pages (default: CPU count)"
+)
+
+parser.add_argument(
+    "--io-threads",
+    type = int,
+    metavar = "N",
+    help = "Threads per process that read page inputs ahead and serialize outputs into their files behind, 0 for synchronous I/O (default: [build] io_threads in wobsite.toml, or 8)"
+)
+
+parser.add_argument(
+    "--io-window",
+    type = int,
+    metavar = "N",
+    help = "Pages read ahead of, and compiled pages held for writing behind, the compile step (default: [build] io_window in wobsite.toml, or 32)"
+)
+
+parser.add_argument(
+    "--memory-budget",
+    type = int,
+    metavar = "MIB",
+    help = "Soft limit of MIB MiB of resident memory per compiling process: shrinks the I/O window to at most 4 pages, does not cache rendered Markdown and releases caches when over it. The page list and discovery index are still held in full (default: [build] memory_budget in wobsite.toml, or no limit)"
+)
+
+parser.add_argument(
+    "--trace-memory",
+    action = "store_true",
+    help = "Trace Python allocations and report the peak of each build phase"
+)
+
+parser.add_argument(
+    "--cache-dir",
+    type = Path,
+    help = "Directory holding build state and cached results (default: .wobsite-cache in the website directory)"
+)
+
+parser.add_argument(
+    "--asset-link",
+    choices = LINK_MODES,
+    default = "copy",
+    help = "How changed assets are placed in the output directory (default: copy)"
+)
+
+parser.add_argument(
+    "--asset-checksum",
+    action = "store_true",
+    help = "Compare asset contents by hash when their size matches but their modification time does not"
+)
+
+parser.add_argument(
+    "--asset-hash",
+    action = "store_true",
+    help = "Add a content hash to asset file names, rewrite references to them and write asset-manifest.json"
+)
+
+parser.add_argument(
+    "--minify",
+    action = "store_true",
+    help = "Drop comments and collapse insignificant whitespace in compiled pages"
+)
+
+parser.add_argument(
+    "--gzip",
+    action = "store_true",
+    help = "Write a .gz sibling next to every compressible output, recompressing only changed files"
+)
+
+parser.add_argument(
+    "--gzip-min-size",
+    type = int,
+    default = DEFAULT_MIN_SIZE,
+    metavar = "BYTES",
+    help = f"Outputs smaller than this are not compressed (default: {DEFAULT_MIN_SIZE})"
+)
+
+parser.add_argument(
+    "--gzip-level",
+    type = int,
+    choices = range(1, 10),
+    default = DEFAULT_LEVEL,
+    metavar = "LEVEL",
+    help = f"Compression level from 1 to 9 (default: {DEFAULT_LEVEL})"
+)
+
+parser.add_argument(
+    "--shard",
+    type = shard_argument,
+    metavar = "I/N",
+    help = "Compile only the I-th of N disjoint parts of the pages and assets, into .output-shard-I-of-N (see --merge)"
+)
+
+parser.add_argument(
+    "--plan",
+    action = "store_true",
+    help = "Print the pages that would be compiled, assets copied and outputs removed, with an estimated time, without building"
+)
+
+parser.add_argument(
+    "--profile",
+    action = "store_true",
+    help = "Time each build phase and page and print a summary"
+)
+
+parser.add_argument(
+    "--profile-top",
+    type = int,
+    default = 10,
+    metavar = "N",
+    help = "Number of slowest pages listed by --profile (default: 10)"
+)
+
+parser.add_argument(
+    "--profile-json",
+    type = Path,
+    metavar = "FILE",
+    help = "Write the raw --profile events to FILE as JSON"
+)
+
+parser.add_argument(
+    "--profile-trace",
+    type = Path,
+    metavar = "FILE",
+    help = "Write the --profile events to FILE in Chrome trace event format"
+)
+
+parser.add_argument(
+    "--watch",
+    action = "store_true",
+    help = "Keep running and incrementally rebuild whenever a template, page or asset changes"
+)
+
 args = parser.parse_args()
 
+if args.deps is not None:
+    files = [Path(path.realpath(f)) for f in args.deps]
+
+    site_dir = Path(path.realpath(args.directory)) if args.directory is not None else wobsite_proc.find_site_dir(files[0])
+
+    if site_dir is None:
+        print(f"No wobsite.toml found above {files[0]}")
+        sys.exit(1)
+
+    outputs = wobsite_proc.find_dependents(
+        site_dir,
+        files,
+        None if args.cache_dir is None else Path(path.realpath(args.cache_dir))
+    )
+
+    if outputs is None:
+        print(f"No dependency graph found for {site_dir}, build it first")
+        sys.exit(1)
+
+    for o in outputs:
+        print(o)
+
+    sys.exit(0)
+
+if args.directory is None:
+    parser.error("the following arguments are required: directory")
+
+if args.merge:
+    if wobsite_proc.merge_shards(Path(path.realpath(args.directory)), args.asset_link):
+        print("Merge successful.")
+        sys.exit(0)
+    else:
+        print("Merge failed")
+        sys.exit(1)
+
 directory = args.directory
 
 if not path.exists(directory):
@@ -29,7 +243,40 @@ directory = Path(path.realpath(directory))
 if not path.isdir(directory):
     print(f"{directory} is not a directory")
 
-if wobsite_proc.compile_wobsite(directory):
+options = BuildOptions(
+    incremental = args.incremental,
+    jobs = max(1, args.jobs),
+    asset_link = args.asset_link,
+    asset_checksum = args.asset_checksum,
+    asset_hash = args.asset_hash,
+    minify = args.minify,
+    gzip = args.gzip,
+    gzip_min_size = args.gzip_min_size,
+    gzip_level = args.gzip_level,
+    cache_dir = None if args.cache_dir is None else Path(path.realpath(args.cache_dir)),
+    plan = args.plan,
+    profile = args.profile or args.profile_json is not None or args.profile_trace is not None,
+    profile_top = args.profile_top,
+    profile_json = args.profile_json,
+    profile_trace = args.profile_trace,
+    io_threads = args.io_threads,
+    io_window = args.io_window,
+    memory_budget = args.memory_budget,
+    trace_memory = args.trace_memory,
+    shard = args.shard
+)
+
+if args.watch:
+    from wobsite_proc.watch import watch_wobsite
+
+    try:
+        watch_wobsite(directory, options)
+    except KeyboardInterrupt:
+        pass
+elif args.plan:
+    if not wobsite_proc.compile_wobsite(directory, options):
+        print("Planning failed")
+elif wobsite_proc.compile_wobsite(directory, options):
     print("Compilation successful.")
 else:
     print("Compilation failed")
@@ -1,10 +1,18 @@
 from abc import ABC, abstractmethod
-from dataclasses import dataclass
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+import hashlib
 from pathlib import Path
-from typing import Any, Callable, List, Optional, Tuple, TypeVar, Generic, override
+from typing import Any, Callable, Dict, Hashable, List, Optional, Set, Tuple, TypeVar, Generic, override
+import threading
 
 from lxml.html import HtmlElement
 
+from wobsite_oo.compiler.cache import ResultCache
+
+# Bump when a change to a target invalidates results stored in a ResultCache
+CACHE_VERSION = "1"
+
 IN = TypeVar("IN", contravariant=True)
 OUT = TypeVar("OUT", covariant=False) # TODO Exec and RunSynchrounous don't work if OUT is covariant
 CTX = TypeVar("CTX")
@@ -12,17 +20,222 @@ CTX = TypeVar("CTX")
 type TargetInput[CTX, IN] = BaseTarget[CTX, Any, IN]
 class BaseTarget(Generic[CTX, IN, OUT], ABC):
     input: TargetInput[CTX, IN]
+    # Whether results are stored in the evaluation's ResultCache, requires fingerprint and (de)serialize_result
+    cache_results: bool = False
+    # Whether targets of the same type over the same input are evaluated once and share their result. Only targets
+    # holding no state other than their input may set this; others override structure to include their state.
+    share_structure: bool = False
 
     def __init__(self, input: TargetInput[CTX, IN]) -> None:
         self.input = input
 
     def resolve(self, ctx: CTX) -> OUT:
+        return evaluation_of(ctx).resolve(self, ctx)
+
+    # Targets with equal structure are evaluated once and share their result. Each target is its own node unless it
+    # sets share_structure.
+    def structure(self, evaluation: "Evaluation") -> Hashable:
+        if not self.share_structure:
+            return self
+
+        return (type(self), evaluation.node_of(self.input))
+
+    # A digest of everything the result depends on, or None if that cannot be known without evaluating.
+    # Derived targets combine the fingerprints of their dependencies.
+    def fingerprint(self, evaluation: "Evaluation", ctx: CTX) -> Optional[str]:
+        parts = [f"{type(self).__module__}.{type(self).__qualname__}"]
+
+        for d in self.dependencies():
+            f = evaluation.fingerprint_of(d, ctx)
+
+            if f is None:
+                return None
+
+            parts.append(f)
+
+        return digest(parts)
+
+    def serialize_result(self, result: OUT) -> bytes:
+        raise NotImplementedError()
+
+    def deserialize_result(self, data: bytes) -> OUT:
+        raise NotImplementedError()
+
+    # Targets that must be resolved before this one, used to schedule graphs in parallel
+    def dependencies(self) -> List["BaseTarget[CTX, Any, Any]"]:
+        return [self.input]
+
+    def _evaluate(self, ctx: CTX) -> OUT:
         return self._resolve(self.input.resolve(ctx), ctx)
 
     @abstractmethod
     def _resolve(self, input: IN, ctx: CTX) -> OUT:
         pass
 
+class TargetException(Exception):
+    chain: List[BaseTarget[Any, Any, Any]]
+
+    def __init__(self, target: BaseTarget[Any, Any, Any]) -> None:
+        super().__init__(f"Target {type(target).__name__} failed")
+        self.chain = [target]
+
+    def extend(self, target: BaseTarget[Any, Any, Any]) -> None:
+        self.chain.append(target)
+
+    def chain_str(self) -> str:
+        return " <- ".join(type(t).__name__ for t in self.chain)
+
+    @override
+    def __str__(self) -> str:
+        return f"{super().__str__()}: {self.chain_str()}"
+
+def digest(parts: List[str]) -> str:
+    return hashlib.sha256("\0".join([CACHE_VERSION, *parts]).encode()).hexdigest()
+
+def file_digest(path: Path) -> str:
+    with path.open("rb") as file:
+        return hashlib.file_digest(file, "sha256").hexdigest()
+
+class Evaluation:
+    evaluations: Dict[str, int]
+    reuses: Dict[str, int]
+    cache: Optional[ResultCache]
+    cache_hits: int
+    cache_misses: int
+    __fingerprints: Dict[int, Optional[str]]
+    __nodes: Dict[Hashable, int]
+    __targets: Dict[int, Tuple[BaseTarget[Any, Any, Any], int]]
+    __results: Dict[int, Any]
+    __pending: Dict[int, Tuple[int, threading.Event]]
+    __lock: threading.RLock
+
+    def __init__(self, cache: Optional[ResultCache] = None) -> None:
+        self.evaluations = {}
+        self.reuses = {}
+        self.cache = cache
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.__fingerprints = {}
+        self.__nodes = {}
+        self.__targets = {}
+        self.__results = {}
+        self.__pending = {}
+        self.__lock = threading.RLock()
+
+    def node_of(self, target: BaseTarget[Any, Any, Any]) -> int:
+        with self.__lock:
+            entry = self.__targets.get(id(target))
+
+            if entry is None:
+                node = self.__nodes.setdefault(target.structure(self), len(self.__nodes))
+                # Keep the target alive so its id cannot be reused by another target
+                entry = (target, node)
+                self.__targets[id(target)] = entry
+
+            return entry[1]
+
+    def fingerprint_of(self, target: BaseTarget[Any, Any, Any], ctx: Any) -> Optional[str]:
+        node = self.node_of(target)
+
+        with self.__lock:
+            if node in self.__fingerprints:
+                return self.__fingerprints[node]
+
+        f = target.fingerprint(self, ctx)
+
+        with self.__lock:
+            self.__fingerprints[node] = f
+
+        return f
+
+    def resolve(self, target: BaseTarget[Any, Any, OUT], ctx: Any) -> OUT:
+        node = self.node_of(target)
+        name = type(target).__name__
+
+        while True:
+            with self.__lock:
+                if node in self.__results:
+                    self.reuses[name] = self.reuses.get(name, 0) + 1
+                    reused: OUT = self.__results[node]
+                    return reused
+
+                pending = self.__pending.get(node)
+
+                if pending is None:
+                    done = threading.Event()
+                    self.__pending[node] = (threading.get_ident(), done)
+                    break
+
+            if pending[0] == threading.get_ident():
+                raise Exception(f"Dependency cycle detected at target {name}")
+
+            # Another thread is evaluating this node, wait for its result
+            pending[1].wait()
+
+        try:
+            result = self.__evaluate(target, ctx)
+        except TargetException as e:
+            e.extend(target)
+            raise
+        except Exception as e:
+            raise TargetException(target) from e
+        else:
+            with self.__lock:
+                self.evaluations[name] = self.evaluations.get(name, 0) + 1
+                self.__results[node] = result
+        finally:
+            with self.__lock:
+                del self.__pending[node]
+            done.set()
+
+        return result
+
+    def __evaluate(self, target: BaseTarget[Any, Any, OUT], ctx: Any) -> OUT:
+        cache = self.cache
+        key = None
+
+        if cache is not None and target.cache_results:
+            key = self.fingerprint_of(target, ctx)
+
+        if cache is not None and key is not None:
+            data = cache.get(key)
+
+            if data is not None:
+                try:
+                    result = target.deserialize_result(data)
+                except Exception:
+                    pass # Treat unreadable entries as a miss, they are overwritten below
+                else:
+                    with self.__lock:
+                        self.cache_hits += 1
+                    return result
+
+            with self.__lock:
+                self.cache_misses += 1
+
+        result = target._evaluate(ctx) # pyright: ignore[reportPrivateUsage]
+
+        if cache is not None and key is not None:
+            cache.put(key, target.serialize_result(result))
+
+        return result
+
+    def shared_nodes(self) -> int:
+        with self.__lock:
+            return len(self.__targets) - len(self.__nodes)
+
+# Base of every context. The context carries the evaluation of the build it is passed to, so memoized
+# results are shared by everything resolved with it and released along with it.
+@dataclass
+class EvaluationContext:
+    evaluation: Evaluation = field(default_factory = Evaluation, kw_only = True, compare = False, repr = False)
+
+def evaluation_of(ctx: Any) -> Evaluation:
+    if not isinstance(ctx, EvaluationContext):
+        raise TypeError(f"{type(ctx).__name__} is not an EvaluationContext")
+
+    return ctx.evaluation
+
 class Process(Generic[CTX, IN, OUT], BaseTarget[CTX, IN, OUT]):
     proc: Callable[[IN], OUT]
 
@@ -30,11 +243,25 @@ class Process(Generic[CTX, IN, OUT], BaseTarget[CTX, IN, OUT]):
         self.proc = proc
         super().__init__(input)
 
+    @override
+    def structure(self, evaluation: Evaluation) -> Hashable:
+        return (type(self), self.proc, evaluation.node_of(self.input))
+
+    @override
+    def fingerprint(self, evaluation: Evaluation, ctx: CTX) -> Optional[str]:
+        return None # An arbitrary callable cannot be fingerprinted
+
     @override
     def _resolve(self, input: IN, ctx: CTX) -> OUT:
         return self.proc(input)
 
 class Exec(Generic[CTX, OUT], BaseTarget[CTX, BaseTarget[CTX, Any, OUT], OUT]):
+    share_structure = True
+
+    @override
+    def fingerprint(self, evaluation: Evaluation, ctx: CTX) -> Optional[str]:
+        return None # The executed target is only known after resolving the input
+
     @override
     def _resolve(self, input: BaseTarget[CTX, Any, OUT], ctx: CTX) -> OUT:
         return input.resolve(ctx)
@@ -43,18 +270,133 @@ class RootTarget(Generic[CTX, IN], BaseTarget[CTX, IN, None]):
     pass
 
 class RunSynchronous(Generic[CTX], RootTarget[CTX, List[RootTarget[CTX, Any]]]):
+    share_structure = True
+
     def _resolve(self, input: List[RootTarget[CTX, Any]], ctx: CTX) -> None:
         for dep in input:
             dep.resolve(ctx)
 
+class RunParallel(Generic[CTX], RootTarget[CTX, List[RootTarget[CTX, Any]]]):
+    workers: Optional[int]
+
+    def __init__(self, input: TargetInput[CTX, List[RootTarget[CTX, Any]]], workers: Optional[int] = None) -> None:
+        self.workers = workers
+        super().__init__(input)
+
+    @override
+    def structure(self, evaluation: Evaluation) -> Hashable:
+        return (type(self), self.workers, evaluation.node_of(self.input))
+
+    def _resolve(self, input: List[RootTarget[CTX, Any]], ctx: CTX) -> None:
+        evaluation = evaluation_of(ctx)
+
+        targets: Dict[int, BaseTarget[CTX, Any, Any]] = {}
+        waiting_on: Dict[int, Set[int]] = {}
+        dependents: Dict[int, List[int]] = {}
+
+        stack: List[BaseTarget[CTX, Any, Any]] = list(input)
+        while stack:
+            target = stack.pop()
+            node = evaluation.node_of(target)
+
+            if node in targets:
+                continue
+
+            targets[node] = target
+            dependents.setdefault(node, [])
+
+            deps = target.dependencies()
+            waiting_on[node] = { evaluation.node_of(d) for d in deps }
+
+            for d in waiting_on[node]:
+                dependents.setdefault(d, []).append(node)
+            stack.extend(deps)
+
+        with ThreadPoolExecutor(max_workers = self.workers) as executor:
+            running: Dict[Future[Any], int] = {}
+
+            def schedule(node: int) -> None:
+                running[executor.submit(targets[node].resolve, ctx)] = node
+
+            for node, waiting in waiting_on.items():
+                if not waiting:
+                    schedule(node)
+
+            while running:
+                finished, _ = wait(running, return_when = FIRST_COMPLETED)
+
+                for future in finished:
+                    node = running.pop(future)
+                    error = future.exception()
+
+                    if error is not None:
+                        executor.shutdown(wait = True, cancel_futures = True)
+                        raise self.__extend_chain(error, node, targets, dependents)
+
+                    for d in dependents[node]:
+                        waiting_on[d].discard(node)
+
+                        if not waiting_on[d]:
+                            schedule(d)
+
+    def __extend_chain(self, error: BaseException, node: int, targets: Dict[int, BaseTarget[CTX, Any, Any]], dependents: Dict[int, List[int]]) -> BaseException:
+        if not isinstance(error, TargetException):
+            return error
+
+        # Walk any path from the failed target up to one of the roots
+        while dependents[node]:
+            node = dependents[node][0]
+            error.extend(targets[node])
+
+        return error
+
 class LeafTarget(Generic[CTX, OUT], BaseTarget[CTX, None, OUT]):
     def __init__(self) -> None:
         super().__init__(UnreachableTarget[CTX]())
 
     @override
-    def resolve(self, ctx: CTX) -> OUT:
+    def dependencies(self) -> List[BaseTarget[CTX, Any, Any]]:
+        return []
+
+    @override
+    def fingerprint(self, evaluation: Evaluation, ctx: CTX) -> Optional[str]:
+        return None
+
+    @override
+    def _evaluate(self, ctx: CTX) -> OUT:
         return self._resolve(None, ctx)
 
+# A constant input of any context
+class ValueLeaf(Generic[CTX, OUT], LeafTarget[CTX, OUT]):
+    value: OUT
+
+    def __init__(self, value: OUT) -> None:
+        self.value = value
+        super().__init__()
+
+    # Values that compare equal across types, such as 1, 1.0 and True, are kept apart by their type
+    @override
+    def structure(self, evaluation: Evaluation) -> Hashable:
+        structure = (type(self), type(self.value), self.value)
+
+        try:
+            hash(structure)
+        except TypeError:
+            return self
+
+        return structure
+
+    @override
+    def fingerprint(self, evaluation: Evaluation, ctx: CTX) -> Optional[str]:
+        if isinstance(self.value, (str, int, float, bool, Path)):
+            return digest([type(self).__qualname__, repr(self.value)])
+
+        return None
+
+    @override
+    def _resolve(self, input: None, ctx: CTX) -> OUT:
+        return self.value
+
 OUT1 = TypeVar("OUT1", covariant=True)
 OUT2 = TypeVar("OUT2", covariant=True)
 class AssembleTuple(Generic[CTX, OUT1, OUT2], LeafTarget[CTX, Tuple[OUT1, OUT2]]):
@@ -67,6 +409,18 @@ class AssembleTuple(Generic[CTX, OUT1, OUT2], LeafTarget[CTX, Tuple[OUT1, OUT2]]
 
         super().__init__()
 
+    @override
+    def structure(self, evaluation: Evaluation) -> Hashable:
+        return (type(self), evaluation.node_of(self.input_1), evaluation.node_of(self.input_2))
+
+    @override
+    def dependencies(self) -> List[BaseTarget[CTX, Any, Any]]:
+        return [self.input_1, self.input_2]
+
+    @override
+    def fingerprint(self, evaluation: Evaluation, ctx: CTX) -> Optional[str]:
+        return super(LeafTarget, self).fingerprint(evaluation, ctx)
+
     @override
     def _resolve(self, input: None, ctx: CTX) -> Tuple[OUT1, OUT2]:
         return (
@@ -81,6 +435,14 @@ class UnreachableTarget(Generic[CTX], BaseTarget[CTX, None, None]):
     @override
     def resolve(self, ctx: CTX) -> None:
         raise Exception("Unreachable target called")
+
+    @override
+    def structure(self, evaluation: Evaluation) -> Hashable:
+        return (type(self),)
+
+    @override
+    def dependencies(self) -> List[BaseTarget[CTX, Any, Any]]:
+        return []
     
     def _resolve(self, input: None, ctx: CTX) -> None:
         raise Exception("Unreachable target called")
@@ -93,6 +455,8 @@ class Artifact(ABC):
 
 A = TypeVar("A", bound=Artifact)
 class WriteArtifact(Generic[A], RootTarget[Any, Tuple[A, Path]]):
+    share_structure = True
+
     def _resolve(self, input: Tuple[A, Path], ctx: Any) -> None:
         artifact = input[0]
         path = input[1]
@@ -0,0 +1,84 @@
+import os
+from pathlib import Path
+import threading
+from typing import Dict, Final, List, Optional, Tuple
+
+DEFAULT_MAX_BYTES: Final[int] = 256 * 1024 * 1024
+
+class ResultCache:
+    dir: Path
+    max_bytes: int
+    __sizes: Dict[Path, int]
+    __total: int
+    __lock: threading.Lock
+
+    def __init__(self, dir: Path, max_bytes: int = DEFAULT_MAX_BYTES) -> None:
+        self.dir = dir
+        self.max_bytes = max_bytes
+        self.__sizes = {}
+        self.__total = 0
+        self.__lock = threading.Lock()
+
+        dir.mkdir(parents = True, exist_ok = True)
+
+        for p in dir.glob("*/*"):
+            if p.is_file() and p.suffix != ".tmp":
+                size = p.stat().st_size
+                self.__sizes[p] = size
+                self.__total += size
+
+    def get(self, key: str) -> Optional[bytes]:
+        path = self.__path(key)
+
+        try:
+            data = path.read_bytes()
+        except OSError:
+            return None
+
+        # Entries are evicted in mtime order, so touching an entry marks it as recently used
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+        return data
+
+    def put(self, key: str, data: bytes) -> None:
+        path = self.__path(key)
+        path.parent.mkdir(exist_ok = True)
+
+        tmp = path.with_name(f"{path.name}.{threading.get_ident()}.tmp")
+        tmp.write_bytes(data)
+        os.replace(tmp, path)
+
+        with self.__lock:
+            self.__total += len(data) - self.__sizes.get(path, 0)
+            self.__sizes[path] = len(data)
+
+            if self.__total > self.max_bytes:
+                self.__evict()
+
+    def size(self) -> int:
+        return self.__total
+
+    def __evict(self) -> None:
+        # Evict down to 90% of the budget so that a full cache does not rescan on every put
+        target = self.max_bytes * 9 // 10
+
+        entries: List[Tuple[int, Path]] = []
+        for p in self.__sizes:
+            try:
+                entries.append((p.stat().st_mtime_ns, p))
+            except OSError:
+                entries.append((0, p))
+        entries.sort()
+
+        for _, p in entries:
+            if self.__total <= target:
+                break
+
+            p.unlink(missing_ok = True)
+            self.__total -= self.__sizes.pop(p)
+
+    def __path(self, key: str) -> Path:
+        return self.dir / key[:2] / key
@@ -1,30 +1,27 @@
 from abc import ABC, abstractmethod
 from dataclasses import dataclass
-from glob import iglob
+import fnmatch
+import os
 from pathlib import Path
-from typing import Any, Generic, Iterable, override
+from typing import Any, Final, Generic, Iterable, Iterator, List, override
 
-from wobsite_oo.compiler import IN, OUT, BaseTarget
+from wobsite_oo.compiler import IN, OUT, BaseTarget, EvaluationContext, ValueLeaf
 from wobsite_oo.manifests import site as site_manifest, template as template_manifest
 from wobsite_oo.manifests.site import SiteManifest
 from wobsite_oo.manifests.template import TemplateManifest
 
+IGNORE_PATTERNS: Final[List[str]] = [".*", "*~", "#*#", "*.tmp"]
+
 @dataclass
-class DiscoverContext:
+class DiscoverContext(EvaluationContext):
     site_dir: Path
     site_manifest: SiteManifest
 
 class DiscoverTarget(Generic[IN, OUT], BaseTarget[DiscoverContext, IN, OUT]):
     pass
 
-class DValueLeaf(Generic[OUT], DiscoverTarget[None, OUT]):
-    value: OUT
-
-    def __init__(self, value: OUT) -> None:
-        self.value = value
-
-    def _resolve(self, input: None, ctx: DiscoverContext) -> OUT:
-        return self.value
+class DValueLeaf(Generic[OUT], ValueLeaf[DiscoverContext, OUT], DiscoverTarget[None, OUT]):
+    pass
 
 class BaseManifestParseTarget(Generic[OUT], DiscoverTarget[Path, OUT], ABC):
     @abstractmethod
@@ -36,11 +33,15 @@ class BaseManifestParseTarget(Generic[OUT], DiscoverTarget[Path, OUT], ABC):
         return self.parse_manifest(input)
 
 class ParseSiteManifest(BaseManifestParseTarget[SiteManifest]):
+    share_structure = True
+
     @override
     def parse_manifest(self, path: Path) -> SiteManifest:
         return site_manifest.parse_file(path)
 
 class ParseTemplateManifest(BaseManifestParseTarget[TemplateManifest]):
+    share_structure = True
+
     @override
     def parse_manifest(self, path: Path) -> TemplateManifest:
         return template_manifest.parse_file(path)
@@ -52,9 +53,27 @@ class BaseManifestDiscover(Generic[OUT], DiscoverTarget[Path, Iterable[BaseManif
 
     @override
     def _resolve(self, input: Path, ctx: DiscoverContext) -> Iterable[BaseManifestParseTarget[OUT]]:
-        return map(lambda x: self.parse_manifest(DValueLeaf(x)), map(lambda t: Path(t), iglob(str(input.with_segments("**", "*.[Tt[Oo[Mm[Ll]")), recursive=True)))
+        return map(lambda x: self.parse_manifest(DValueLeaf(x)), scan_manifests(input))
+
+# One scandir per directory, pruning ignored directories instead of matching every path under them
+def scan_manifests(dir: Path) -> Iterator[Path]:
+    try:
+        entries = sorted(os.scandir(dir), key = lambda e: e.name)
+    except OSError:
+        return
+
+    for e in entries:
+        if any(fnmatch.fnmatchcase(e.name, p) for p in IGNORE_PATTERNS):
+            continue
+
+        if e.is_dir(follow_symlinks = False):
+            yield from scan_manifests(Path(e.path))
+        elif e.name.lower().endswith(".toml") and e.is_file():
+            yield Path(e.path)
 
 class DiscoverTemplates(BaseManifestDiscover[TemplateManifest]):
+    share_structure = True
+
     @override
     def parse_manifest(self, path: DiscoverTarget[Any, Path]) -> BaseManifestParseTarget[TemplateManifest]:
         return ParseTemplateManifest(path)
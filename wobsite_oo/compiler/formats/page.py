@@ -1,9 +1,9 @@
 from pathlib import Path
-from typing import override
+from typing import Optional, override
 
 from lxml import html
 
-from wobsite_oo.compiler import PageMeta, ParsedPage
+from wobsite_oo.compiler import Evaluation, PageMeta, ParsedPage, digest, file_digest
 from wobsite_oo.compiler.generate import GenerationContext, GenerationTarget
 
 HTML_TAG_PAGE_META = "wobsite-page"
@@ -13,6 +13,18 @@ HTML_ATTRIB_PAGE_META_OUTPUT_FILE = "output_file"
 HTML_TAG_PAGE_PLACEHOLDER = "wobsite-page-placeholder"
 
 class ParseHtmlPage(GenerationTarget[Path, ParsedPage]):
+    share_structure = True
+
+    # The output file is derived from the input path and the output directory, not only the contents
+    @override
+    def fingerprint(self, evaluation: Evaluation, ctx: GenerationContext) -> Optional[str]:
+        source = evaluation.fingerprint_of(self.input, ctx)
+
+        if source is None:
+            return None
+
+        return digest([type(self).__qualname__, source, str(ctx.get_output_dir()), file_digest(self.input.resolve(ctx))])
+
     @override
     def _resolve(self, input: Path, ctx: GenerationContext) -> ParsedPage:
         with input.open() as file:
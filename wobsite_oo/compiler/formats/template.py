@@ -1,12 +1,18 @@
 from pathlib import Path
-from typing import override
+from typing import Optional, override
 
 from lxml import html
 
-from wobsite_oo.compiler import ParsedTemplate, TemplateMeta
+from wobsite_oo.compiler import Evaluation, ParsedTemplate, TemplateMeta, digest, file_digest
 from wobsite_oo.compiler.generate import GenerationContext, GenerationTarget
 
 class ParseHtmlTemplate(GenerationTarget[Path, ParsedTemplate]):
+    share_structure = True
+
+    @override
+    def fingerprint(self, evaluation: Evaluation, ctx: GenerationContext) -> Optional[str]:
+        return digest([type(self).__qualname__, file_digest(self.input.resolve(ctx))])
+
     @override
     def _resolve(self, input: Path, ctx: GenerationContext) -> ParsedTemplate:
         with input.open() as file:
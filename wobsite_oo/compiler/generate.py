@@ -1,13 +1,15 @@
+from copy import deepcopy
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Generic, Tuple, override
+from typing import Generic, Optional, Tuple, override
 
+from lxml import etree, html
 from lxml.html import builder as E
 
-from wobsite_oo.compiler import IN, OUT, BaseTarget, OutputPage, ParsedPage, ParsedTemplate
+from wobsite_oo.compiler import IN, OUT, BaseTarget, Evaluation, EvaluationContext, OutputPage, ParsedPage, ParsedTemplate, digest
 
 @dataclass
-class GenerationContext:
+class GenerationContext(EvaluationContext):
     def get_output_dir(self) -> Path:
         return Path("") # TODO
 
@@ -15,11 +17,15 @@ class GenerationTarget(Generic[IN, OUT], BaseTarget[GenerationContext, IN, OUT])
     pass
 
 class ResolveTemplatePath(GenerationTarget[str, Path]):
+    share_structure = True
+
     @override
     def _resolve(self, input: str, ctx: GenerationContext) -> Path:
         return super()._resolve(input, ctx) # TODO
 
 class MetaParsePage(GenerationTarget[Path, GenerationTarget[Path, ParsedPage]]):
+    share_structure = True
+
     @override
     def _resolve(self, input: Path, ctx: GenerationContext) -> GenerationTarget[Path, ParsedPage]:
         if not input.is_file():
@@ -30,6 +36,8 @@ class MetaParsePage(GenerationTarget[Path, GenerationTarget[Path, ParsedPage]]):
         return super()._resolve(input, ctx) # TODO
 
 class MetaParseTemplate(GenerationTarget[Path, GenerationTarget[Path, ParsedTemplate]]):
+    share_structure = True
+
     @override
     def _resolve(self, input: Path, ctx: GenerationContext) -> GenerationTarget[Path, ParsedTemplate]:
         if not input.is_file():
@@ -41,6 +49,32 @@ class MetaParseTemplate(GenerationTarget[Path, GenerationTarget[Path, ParsedTemp
 
 HTML_TAG_PAGE_PLACEHOLDER = "wobsite-page-placeholder"
 class GeneratePage(GenerationTarget[Tuple[ParsedPage, ParsedTemplate | None], OutputPage]):
+    cache_results = True
+    share_structure = True
+
+    @override
+    def fingerprint(self, evaluation: Evaluation, ctx: GenerationContext) -> Optional[str]:
+        input = super().fingerprint(evaluation, ctx)
+
+        if input is None:
+            return None
+
+        # The output path is joined onto the output directory
+        return digest([input, str(ctx.get_output_dir())])
+
+    @override
+    def serialize_result(self, result: OutputPage) -> bytes:
+        return str(result.path).encode() + b"\0" + etree.tostring(result.content, method = "html")
+
+    @override
+    def deserialize_result(self, data: bytes) -> OutputPage:
+        path, content = data.split(b"\0", 1)
+
+        return OutputPage(
+            content = html.fromstring(content),
+            path = Path(path.decode())
+        )
+
     @override
     def _resolve(self, input: Tuple[ParsedPage, ParsedTemplate | None], ctx: GenerationContext) -> OutputPage:
         page = input[0]
@@ -48,7 +82,7 @@ class GeneratePage(GenerationTarget[Tuple[ParsedPage, ParsedTemplate | None], Ou
 
         path = ctx.get_output_dir().joinpath(page.meta.output_file)
 
-        page_content = E.DIV(page.content)
+        page_content = E.DIV(*page.content)
         page_content.set("id", "wobsite-page-content")
 
         if not template:
@@ -57,16 +91,17 @@ class GeneratePage(GenerationTarget[Tuple[ParsedPage, ParsedTemplate | None], Ou
                 path = path
             )
 
-        document = template.content
+        # The parsed template may be shared by many pages, so substitute into a private copy
+        document = deepcopy(template.content)
 
         e = document.find(f".//{HTML_TAG_PAGE_PLACEHOLDER}")
 
-        if not e:
+        if e is None:
             pass # WARN: template does not contain page placeholder
         else:
             p = e.getparent()
 
-            if not p:
+            if p is None:
                 # If the placeholder element is the root, then disregard the template content entirely
                 return OutputPage(
                     content = page_content,
@@ -76,7 +111,7 @@ class GeneratePage(GenerationTarget[Tuple[ParsedPage, ParsedTemplate | None], Ou
                 p.replace(e, page_content)
 
         return OutputPage(
-            content = page_content,
+            content = document,
             path = path
         )
 
@@ -1,20 +1,65 @@
-from dataclasses import dataclass
+from __future__ import annotations
+
 from pathlib import Path
-import shutil
-from typing import Callable, List, Optional
+from typing import TYPE_CHECKING, Callable, Final, List, Optional, Set, Tuple, TypeVar
 
-from wobsite_proc import template, page
 from wobsite_proc.log import Log
-from wobsite_proc.manifests import page as page_manifest, site as site_manifest, template as template_manifest
-def compile_wobsite(path: Path) -> bool:
+from wobsite_proc.manifests import site as site_manifest
+
+# Every stage is imported when it first runs, so that importing the package (or running the CLI's --help or
+# deps query) does not pay for the whole build
+if TYPE_CHECKING:
+    from wobsite_proc import asset_hash, build, build_state, deps
+    from wobsite_proc.assets import AssetLinkMode
+    from wobsite_proc.discover import Discovery, PageSource
+    from wobsite_proc.manifests.page import PageManifest
+    from wobsite_proc.options import BuildOptions
+    from wobsite_proc.toml_utils import TomlTable
+
+OUTPUT_DIR_NAME: Final[str] = ".output"
+CACHE_DIR_NAME: Final[str] = ".wobsite-cache"
+
+def compile_wobsite(path: Path, options: Optional[BuildOptions] = None, session: Optional[build.BuildSession] = None) -> bool:
+    from wobsite_proc.options import BuildOptions
+
+    if options is None:
+        options = BuildOptions()
+
+    if not options.trace_memory:
+        return __compile_wobsite(path, options, session)
+
+    import tracemalloc
+
+    if tracemalloc.is_tracing():
+        return __compile_wobsite(path, options, session)
+
+    tracemalloc.start()
+
+    try:
+        return __compile_wobsite(path, options, session)
+    finally:
+        tracemalloc.stop()
+
+def __compile_wobsite(path: Path, options: BuildOptions, session: Optional[build.BuildSession]) -> bool:
+    from wobsite_proc import asset_hash, assets, build, build_state, compress, deps, discover, file_io, memory, shard
+    from wobsite_proc.manifests import template as template_manifest
+    from wobsite_proc.profiling import Profiler
+    from wobsite_proc.summary import BuildSummary
+
     log = Log()
+    summary = BuildSummary()
+    profiler = Profiler(options.profile, options.trace_memory)
+    phase = profiler.phase
 
     log.info(f"Compiling {path}")
 
-    manifest = site_manifest.get_in(path)
+    manifest_path = path / site_manifest.FILE_NAME
+
+    with phase("manifest"):
+        manifest = site_manifest.get_in(path)
 
     if manifest is None:
-        log.err(f"{path / site_manifest.FILE_NAME} does not exist")
+        log.err(f"{manifest_path} does not exist")
         return False
 
     template_paths = __get_dirs(
@@ -26,11 +71,33 @@ def compile_wobsite(path: Path) -> bool:
     if template_paths is None:
         return False
     
-    template_manifests = {
-        m.name: m for m in [
-            template_manifest.parse_file(m, p) for p in template_paths for m in __find(p, "toml")
+    cache_dir = options.cache_dir if options.cache_dir is not None else (path / CACHE_DIR_NAME)
+
+    # Shards keep their own state, so several can build from the same checkout
+    if options.shard is not None:
+        cache_dir = cache_dir / options.shard.name
+    index_path = (cache_dir / discover.FILE_NAME)
+
+    if session is not None and session.discovery is not None:
+        index = session.discovery
+    else:
+        with phase("state"):
+            index = discover.load(index_path)
+
+    discovery = discover.Discovery(index, discover.IGNORE_PATTERNS + manifest.ignore, summary)
+
+    with phase("discover"):
+        template_manifest_paths = [
+            (m, p) for p in template_paths for m in discovery.find_manifests(p)
         ]
-    }
+
+    with phase("manifest"):
+        template_list = __parse_manifests(template_manifest_paths, template_manifest.from_toml, discovery, log)
+
+    if template_list is None:
+        return False
+
+    template_manifests = { m.name: m for m in template_list }
 
     log.info(f"Found {len(template_manifests)} template(s)")
 
@@ -43,41 +110,52 @@ def compile_wobsite(path: Path) -> bool:
     if page_paths is None:
         return False
 
-    page_manifests = [
-        page_manifest.parse_file(m, p) for p in page_paths for m in __find(p, "toml")
-    ]
+    with phase("discover"):
+        page_sources = [
+            (s, p) for p in page_paths for s in discovery.find_pages(p)
+        ]
+
+    if options.shard is not None:
+        contains = options.shard.contains
+        page_sources = [(s, p) for s, p in page_sources if contains(s.path.relative_to(path).as_posix())]
 
-    log.info(f"Found {len(page_manifests)} page(s)")
+    with phase("manifest"):
+        page_jobs = __parse_pages(page_sources, discovery, log)
 
-    output: List[__BuildArtifact] = []
-    for p in page_manifests:
-        cpage = page.parse_html(p)
-        rpath = p.path.parent.relative_to(p.dir) / p.file
-        if p.template is None:
-            log.info(f"Compiled templateless page {p.path}")
-            output.append(__BuildArtifact(rpath, cpage.to_string()))
-            continue
+    if page_jobs is None:
+        return False
 
-        if p.template not in template_manifests:
-            log.err(f"Template {p.template} required by page {p.path} not found")
-            return False
-        
-        p_template = template_manifests[p.template]
-        ctemplate = template.parse_html(p_template)
-        ctemplate.substitute_content(cpage.content, log)
+    if options.shard is not None:
+        log.info(f"Found {len(page_jobs)} page(s) in shard {options.shard.index}/{options.shard.count}")
+    else:
+        log.info(f"Found {len(page_jobs)} page(s)")
+
+    if not options.plan:
+        with phase("state"):
+            discover.save(discovery.prune(), index_path)
+    if session is not None:
+        session.discovery = discovery.index
 
-        log.info(f"Compiled page {p.path} with template {p_template.name}")
-        output.append(__BuildArtifact(rpath, ctemplate.to_string()))
+    output_base_dir = (path / OUTPUT_DIR_NAME)
+    if options.shard is not None:
+        output_base_dir = shard.output_dir(output_base_dir, options.shard)
+    state_path = (cache_dir / build_state.FILE_NAME)
 
-    output_base_dir = (path / ".output")
-    shutil.rmtree(output_base_dir)
-    output_base_dir.mkdir(parents = True, exist_ok = True)
+    if session is not None and session.state is not None:
+        saved_state = session.state
+    else:
+        with phase("state"):
+            saved_state = build_state.load(state_path)
 
-    for o in output:
-        opath = output_base_dir / o.path
-        with open(opath, "xt") as file:
-            opath.parent.mkdir(parents = True, exist_ok = True)
-            file.write(o.text)
+    # Only incremental builds skip unchanged pages; compression and asset hash records are keyed by content
+    # and are reused by full builds too
+    if options.incremental:
+        previous_state = saved_state
+    else:
+        previous_state = build_state.BuildState(compressed = saved_state.compressed, asset_hashes = saved_state.asset_hashes)
+
+    if not options.plan:
+        output_base_dir.mkdir(parents = True, exist_ok = True)
 
     asset_paths = __get_dirs(
         path,
@@ -89,19 +167,193 @@ def compile_wobsite(path: Path) -> bool:
         log.err(f"Asset path path {path} does not exist")
         return False
 
-    for p in asset_paths:
-        for a in __find(p, None):
-            rpath = a.relative_to(p)
-            opath = output_base_dir / rpath
-            log.info(f"Copying asset {a} to {opath}")
-            shutil.copy2(a, opath)
+    current_state = build_state.BuildState()
+
+    asset_map = None
+    if options.asset_hash:
+        with phase("assets"):
+            asset_map, current_state.asset_hashes = asset_hash.hash_assets(asset_paths, previous_state.asset_hashes, log)
+
+    memory_budget = options.memory_budget if options.memory_budget is not None else manifest.memory_budget
+    io_window = max(1, __first(options.io_window, manifest.io_window, file_io.DEFAULT_WINDOW))
+
+    # A budget also shrinks the I/O window, since each page in it holds its input or rendered output
+    if memory_budget is not None:
+        io_window = min(io_window, memory.LOW_MEMORY_WINDOW)
+
+    context = build.BuildContext(
+        site_dir = path,
+        output_dir = output_base_dir,
+        templates = template_manifests,
+        previous_state = previous_state,
+        profile = options.profile,
+        io_threads = max(0, __first(options.io_threads, manifest.io_threads, file_io.DEFAULT_THREADS)),
+        io_window = io_window,
+        minify = options.minify,
+        assets = asset_map,
+        macros = manifest.macros,
+        dry_run = options.plan,
+        memory_budget = memory_budget * 2**20 if memory_budget is not None else None
+    )
+
+    cost = __cost_estimator(saved_state)
+
+    failed = False
+
+    with phase("pages"):
+        for r in build.compile_pages(page_jobs, context, options.jobs, session):
+            for m in r.messages:
+                log.print(m)
+
+            profiler.events.extend(r.events)
+
+            summary.template_cache_hits += r.template_cache_hits
+            summary.template_cache_misses += r.template_cache_misses
+            summary.minified_bytes += r.minified_bytes
+
+            if not r.ok or r.record is None:
+                failed = True
+                continue
+
+            current_state.pages[r.key] = r.record
+
+            if r.compiled:
+                summary.pages_compiled += 1
+
+                if options.plan:
+                    log.info(f"Would compile page {r.key} to {r.record.output}")
+
+                    estimate = cost(r.key)
+                    if estimate is None:
+                        summary.pages_unestimated += 1
+                    else:
+                        summary.estimated_ns += estimate
+            else:
+                summary.pages_skipped += 1
+
+    if failed:
+        return False
+
+    with phase("assets"):
+        live_outputs = assets.sync_assets(
+            asset_paths,
+            output_base_dir,
+            options.asset_link,
+            options.asset_checksum,
+            summary,
+            log,
+            asset_map.names if asset_map is not None else None,
+            options.plan,
+            options.shard.contains if options.shard is not None else None
+        )
+    live_outputs.update(output_base_dir / r.output for r in current_state.pages.values())
+
+    if asset_map is not None:
+        if options.plan:
+            live_outputs.add(output_base_dir / asset_hash.MANIFEST_FILE_NAME)
+        else:
+            live_outputs.add(asset_hash.write_manifest(asset_map, output_base_dir))
+
+    if options.gzip and options.plan:
+        live_outputs.update(compress.planned_sidecars(live_outputs))
+    elif options.gzip:
+        with phase("compress"):
+            current_state.compressed = compress.precompress(
+                output_base_dir,
+                live_outputs,
+                previous_state.compressed,
+                options.gzip_min_size,
+                options.gzip_level,
+                options.jobs,
+                summary,
+                log
+            )
+
+    with phase("cleanup"):
+        assets.remove_stale_files(output_base_dir, live_outputs, summary, log, options.plan)
 
+    if options.plan:
+        summary.report_plan(options.jobs, log)
+        return True
+
+    with phase("state"):
+        deps_path = cache_dir / deps.FILE_NAME
+        page_inputs = [deps.page_inputs(p, template_manifests.get(p.template) if p.template is not None else None) for p in page_jobs]
+        current_state.deps_key = deps.graph_key(
+            manifest_path,
+            page_inputs,
+            { k: r.output for k, r in current_state.pages.items() },
+            asset_paths,
+            asset_map.names if asset_map is not None else None,
+            list(current_state.compressed.keys())
+        )
+
+        # No page or asset was added, removed or moved, so the saved graph is still correct
+        if current_state.deps_key != saved_state.deps_key or not deps_path.is_file():
+            deps.save(__dependency_graph(path, manifest_path, page_jobs, page_inputs, asset_paths, asset_map, current_state), deps_path)
+
+        build_state.save(current_state, state_path)
+    if session is not None:
+        session.state = current_state
+
+    summary.peak_rss = memory.peak_rss()
+    summary.memory_peaks = profiler.memory_peaks
+    summary.report(log)
+
+    if options.profile:
+        profiler.report(options.profile_top, log)
+
+        if options.profile_json is not None:
+            profiler.write_json(options.profile_json)
+        if options.profile_trace is not None:
+            profiler.write_trace(options.profile_trace)
+
+    return True
+
+# Combines the output directories of a complete set of shard builds into the site output directory
+def merge_shards(path: Path, link: AssetLinkMode = "copy") -> bool:
+    from wobsite_proc import shard
+    from wobsite_proc.summary import BuildSummary
+
+    log = Log()
+    summary = BuildSummary()
+    output_dir = path / OUTPUT_DIR_NAME
+    shard_dirs = shard.find_shard_dirs(output_dir)
+
+    log.info(f"Merging {len(shard_dirs)} shard output(s) into {output_dir}")
+
+    if not shard.merge(shard_dirs, output_dir, link, summary, log):
+        return False
+
+    log.info(f"Copied {summary.assets_copied} file(s) ({summary.asset_bytes_copied} bytes), skipped {summary.assets_skipped} unchanged file(s)")
+    log.info(f"Removed {summary.stale_files_removed} stale output file(s)")
     return True
 
-@dataclass
-class __BuildArtifact:
-    path: Path
-    text: str
+# Output-relative paths of the outputs affected by changes to files, or None if the site has not been built
+def find_dependents(path: Path, files: List[Path], cache_dir: Optional[Path] = None) -> Optional[List[str]]:
+    from wobsite_proc import deps
+
+    graph = deps.load((cache_dir if cache_dir is not None else path / CACHE_DIR_NAME) / deps.FILE_NAME)
+
+    if graph is None:
+        return None
+
+    outputs: Set[str] = set()
+
+    for f in files:
+        if not f.is_relative_to(path):
+            continue
+
+        outputs.update(deps.dependents(graph, f.relative_to(path).as_posix()))
+
+    return sorted(outputs)
+
+def find_site_dir(file: Path) -> Optional[Path]:
+    for d in [file, *file.parents]:
+        if (d / site_manifest.FILE_NAME).is_file():
+            return d
+
+    return None
 
 def __get_dirs(path: Path, subdirs: List[str], err_callback: Callable[[Path], None]) -> Optional[List[Path]]:
     dirs = [path / i for i in subdirs]
@@ -117,8 +369,102 @@ def __get_dirs(path: Path, subdirs: List[str], err_callback: Callable[[Path], No
     else:
         return dirs
 
-def __find(path: Path, ext: str | None) -> List[Path]:
-    if ext is None:
-        return [p for p in path.glob(f"**/*")]
+M = TypeVar("M")
+
+def __first(*values: Optional[int]) -> int:
+    for v in values:
+        if v is not None:
+            return v
+
+    raise ValueError("No value given")
+
+def __parse_manifests(paths: List[Tuple[Path, Path]], from_toml: Callable[[TomlTable, Path, Path], M], discovery: Discovery, log: Log) -> Optional[List[M]]:
+    manifests: List[M] = []
+    failed = False
+
+    for m, p in paths:
+        try:
+            manifests.append(from_toml(discovery.load_toml(m), m, p))
+        except Exception as e:
+            log.err(f"Could not parse manifest {m}: {e}")
+            failed = True
+
+    if failed:
+        return None
+    else:
+        return manifests
+
+# Pages are estimated by their cost in the last build that compiled them, or by the mean cost of all recorded pages
+def __cost_estimator(state: build_state.BuildState) -> Callable[[str], Optional[int]]:
+    costs = { k: v.cost_ns for k, v in state.pages.items() if v.cost_ns > 0 }
+    mean = sum(costs.values()) // len(costs) if costs else None
+
+    return lambda key: costs.get(key, mean)
+
+def __dependency_graph(
+    path: Path,
+    manifest_path: Path,
+    jobs: List[PageManifest],
+    page_inputs: List[List[Path]],
+    asset_paths: List[Path],
+    asset_map: Optional[asset_hash.AssetMap],
+    state: build_state.BuildState
+) -> deps.DependencyGraph:
+    from wobsite_proc import asset_hash, deps
+
+    graph = deps.DependencyGraph(
+        asset_dirs = [p.relative_to(path).as_posix() for p in asset_paths],
+        asset_names = asset_map.names if asset_map is not None else None,
+        asset_manifest = asset_hash.MANIFEST_FILE_NAME if asset_map is not None else None,
+        compressed = list(state.compressed.keys())
+    )
+
+    for p, inputs in zip(jobs, page_inputs):
+        record = state.pages.get(p.path.relative_to(path).as_posix())
+        if record is None:
+            continue
+
+        # The site manifest holds settings and macros used by every page
+        deps.add_page(graph, [manifest_path] + inputs, record.output, path)
+
+    return graph
+
+def __parse_pages(sources: List[Tuple[PageSource, Path]], discovery: Discovery, log: Log) -> Optional[List[PageManifest]]:
+    from wobsite_proc.manifests import page as page_manifest
+    from wobsite_proc.toml_utils import merge_tables
+
+    manifests: List[PageManifest] = []
+    failed = False
+
+    for s, p in sources:
+        try:
+            if s.front_matter:
+                toml = discovery.load_front_matter(s.path)
+
+                # Content files of two-file pages have no front matter
+                if toml is None:
+                    continue
+            else:
+                toml = discovery.load_toml(s.path)
+
+            defaults: TomlTable = {}
+            for d in s.defaults:
+                defaults = merge_tables(defaults, discovery.load_toml(d))
+
+            toml = merge_tables(defaults, toml)
+
+            if s.front_matter:
+                m = page_manifest.from_front_matter(toml, s.path, p)
+            else:
+                m = page_manifest.from_toml(toml, s.path, p)
+
+            m.defaults = s.defaults
+            manifests.append(m)
+        except Exception as e:
+            log.err(f"Could not parse manifest {s.path}: {e}")
+            failed = True
+
+    if failed:
+        return None
     else:
-        return [p for p in path.glob(f"**/*.{ext}")]
+        return manifests
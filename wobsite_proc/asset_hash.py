@@ -0,0 +1,136 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+import hashlib
+import json
+from pathlib import Path
+import posixpath
+from typing import TYPE_CHECKING, Dict, Final, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from wobsite_proc.build_state import AssetHashRecord
+from wobsite_proc.fs import walk_files
+from wobsite_proc.log import Log
+
+if TYPE_CHECKING:
+    from lxml.html import HtmlElement
+
+MANIFEST_FILE_NAME: Final[str] = "asset-manifest.json"
+HASH_LENGTH: Final[int] = 8
+
+REFERENCE_ATTRIBUTES: Final[List[str]] = ["src", "href"]
+SRCSET_ATTRIBUTE: Final[str] = "srcset"
+
+@dataclass
+class AssetMap:
+    # Output-relative POSIX path of each asset to the path it is written to
+    names: Dict[str, str] = field(default_factory = lambda: {})
+    digest: str = ""
+
+def hash_assets(asset_paths: List[Path], previous: Dict[str, AssetHashRecord], log: Log) -> Tuple[AssetMap, Dict[str, AssetHashRecord]]:
+    names: Dict[str, str] = {}
+    records: Dict[str, AssetHashRecord] = {}
+
+    for p in asset_paths:
+        for a, st in walk_files(p):
+            key = str(a)
+            record = previous.get(key)
+
+            # Unchanged assets keep the hash of the previous build instead of being read again
+            if record is None or (record.size, record.mtime_ns) != (st.st_size, st.st_mtime_ns):
+                with a.open("rb") as file:
+                    digest = hashlib.file_digest(file, "sha256").hexdigest()
+                record = AssetHashRecord(size = st.st_size, mtime_ns = st.st_mtime_ns, sha256 = digest)
+                log.info(f"Hashed asset {a}")
+
+            records[key] = record
+
+            rel = a.relative_to(p).as_posix()
+            names[rel] = hashed_name(rel, record.sha256)
+
+    digest = hashlib.sha256(json.dumps(names, sort_keys = True).encode()).hexdigest()
+    return AssetMap(names = names, digest = digest), records
+
+def hashed_name(rel: str, sha256: str) -> str:
+    dir, name = posixpath.split(rel)
+    stem, dot, ext = name.rpartition(".")
+
+    if not stem:
+        stem, dot, ext = name, "", ""
+
+    return posixpath.join(dir, f"{stem}.{sha256[:HASH_LENGTH]}{dot}{ext}")
+
+# Rewrites references to assets in src, href and srcset attributes. base is the output-relative directory of the
+# page the tree is written to. Returns the number of references rewritten.
+def rewrite_references(root: HtmlElement, base: str, assets: AssetMap) -> int:
+    from lxml import etree
+
+    count = 0
+
+    # Only elements have attributes, comments and processing instructions are skipped
+    for e in root.iter(etree.Element):
+        for a in REFERENCE_ATTRIBUTES:
+            value = e.get(a)
+            if value is None:
+                continue
+
+            rewritten = __rewrite_url(value, base, assets)
+            if rewritten is not None:
+                e.set(a, rewritten)
+                count += 1
+
+        srcset = e.get(SRCSET_ATTRIBUTE)
+        if srcset is not None:
+            candidates: List[str] = []
+            changed = False
+
+            for c in srcset.split(","):
+                parts = c.strip().split(maxsplit = 1)
+                if not parts:
+                    continue
+
+                rewritten = __rewrite_url(parts[0], base, assets)
+                if rewritten is not None:
+                    parts[0] = rewritten
+                    changed = True
+                    count += 1
+
+                candidates.append(" ".join(parts))
+
+            if changed:
+                e.set(SRCSET_ATTRIBUTE, ", ".join(candidates))
+
+    return count
+
+def __rewrite_url(url: str, base: str, assets: AssetMap) -> Optional[str]:
+    parts = urlsplit(url)
+
+    if parts.scheme or parts.netloc or not parts.path:
+        return None
+
+    if parts.path.startswith("/"):
+        rel = posixpath.normpath(parts.path.lstrip("/"))
+    else:
+        rel = posixpath.normpath(posixpath.join(base, parts.path))
+
+    hashed = assets.names.get(rel)
+    if hashed is None:
+        return None
+
+    # Only the file name changes, so the reference keeps whatever form it was written in
+    path = posixpath.join(posixpath.dirname(parts.path), posixpath.basename(hashed))
+    return parts._replace(path = path).geturl()
+
+def write_manifest(assets: AssetMap, output_dir: Path) -> Path:
+    path = output_dir / MANIFEST_FILE_NAME
+    data = json.dumps(assets.names, indent = 4, sort_keys = True).encode()
+
+    # Leave an identical manifest untouched so it is not treated as changed by later stages
+    try:
+        if path.read_bytes() == data:
+            return path
+    except OSError:
+        pass
+
+    path.write_bytes(data)
+    return path
@@ -0,0 +1,143 @@
+import hashlib
+import os
+from pathlib import Path
+import shutil
+from typing import Callable, Dict, Final, List, Literal, Optional, Set, TypeAlias
+
+from wobsite_proc.fs import remove_empty_dirs, walk_files
+from wobsite_proc.log import Log
+from wobsite_proc.summary import BuildSummary
+
+AssetLinkMode: TypeAlias = Literal["copy", "hardlink", "reflink"]
+
+LINK_MODES: Final[List[str]] = ["copy", "hardlink", "reflink"]
+
+# ioctl request number of Linux's FICLONE
+FICLONE: Final[int] = 0x40049409
+
+# names maps the output-relative path of an asset to the path it is written to instead
+def sync_assets(
+    asset_paths: List[Path],
+    output_dir: Path,
+    link: AssetLinkMode,
+    checksum: bool,
+    summary: BuildSummary,
+    log: Log,
+    names: Optional[Dict[str, str]] = None,
+    dry_run: bool = False,
+    select: Optional[Callable[[str], bool]] = None
+) -> Set[Path]:
+    synced: Dict[Path, Path] = {}
+
+    for p in asset_paths:
+        for a, st in walk_files(p):
+            rel = a.relative_to(p).as_posix()
+
+            if select is not None and not select(rel):
+                continue
+
+            opath = output_dir / (names.get(rel, rel) if names is not None else rel)
+
+            if opath in synced:
+                log.warn(f"Asset {a} overwrites asset {synced[opath]}")
+            synced[opath] = a
+
+            sync_file(a, st, opath, link, checksum, summary, log, dry_run)
+
+    return set(synced)
+
+# Copies or links source to target unless target is already up to date
+def sync_file(
+    source: Path,
+    st: os.stat_result,
+    target: Path,
+    link: AssetLinkMode,
+    checksum: bool,
+    summary: BuildSummary,
+    log: Log,
+    dry_run: bool = False
+) -> None:
+    if __is_up_to_date(source, st, target, checksum, dry_run):
+        summary.assets_skipped += 1
+        summary.asset_bytes_skipped += st.st_size
+        return
+
+    summary.assets_copied += 1
+    summary.asset_bytes_copied += st.st_size
+
+    if dry_run:
+        log.info(f"Would copy asset {source} to {target}")
+        return
+
+    log.info(f"Copying asset {source} to {target}")
+    target.parent.mkdir(parents = True, exist_ok = True)
+    # Never write through an existing file, it may be a hardlink to the source
+    target.unlink(missing_ok = True)
+    __transfer(source, target, link)
+
+def remove_stale_files(output_dir: Path, live: Set[Path], summary: BuildSummary, log: Log, dry_run: bool = False) -> None:
+    for f, _ in walk_files(output_dir):
+        if f in live:
+            continue
+
+        summary.stale_files_removed += 1
+
+        if dry_run:
+            log.info(f"Would remove stale file {f}")
+        else:
+            log.info(f"Removing stale file {f}")
+            f.unlink()
+
+    if not dry_run:
+        remove_empty_dirs(output_dir)
+
+def __is_up_to_date(source: Path, st: os.stat_result, target: Path, checksum: bool, dry_run: bool) -> bool:
+    try:
+        tst = target.stat()
+    except OSError:
+        return False
+
+    if (st.st_dev, st.st_ino) == (tst.st_dev, tst.st_ino):
+        return True
+
+    if st.st_size != tst.st_size:
+        return False
+
+    if st.st_mtime_ns == tst.st_mtime_ns:
+        return True
+
+    if checksum and __hash(source) == __hash(target):
+        # Adopt the source mtime so the next build does not need to hash again
+        if not dry_run:
+            os.utime(target, ns = (tst.st_atime_ns, st.st_mtime_ns))
+        return True
+
+    return False
+
+def __hash(path: Path) -> bytes:
+    with path.open("rb") as file:
+        return hashlib.file_digest(file, "sha256").digest()
+
+def __transfer(source: Path, target: Path, link: AssetLinkMode) -> None:
+    if link == "hardlink":
+        try:
+            os.link(source, target)
+            return
+        except OSError:
+            pass
+    elif link == "reflink":
+        try:
+            __reflink(source, target)
+            return
+        except (OSError, ImportError):
+            target.unlink(missing_ok = True)
+
+    shutil.copy2(source, target)
+
+def __reflink(source: Path, target: Path) -> None:
+    import fcntl
+
+    with source.open("rb") as src, target.open("xb") as dst:
+        fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+
+    shutil.copystat(source, target)
@@ -0,0 +1,429 @@
+from dataclasses import dataclass, field
+from pathlib import Path
+import time
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from wobsite_proc.asset_hash import AssetMap
+from wobsite_proc.build_state import BuildState, FileHasher, PageRecord
+from wobsite_proc.discover import DiscoveryIndex
+from wobsite_proc.file_io import DEFAULT_WINDOW, FileIO
+from wobsite_proc.log import Log
+from wobsite_proc.macro import MacroTable, make_table
+from wobsite_proc.manifests import page as page_manifest
+from wobsite_proc.manifests.page import PageManifest
+from wobsite_proc.memory import MemoryBudget
+from wobsite_proc.manifests.template import TemplateManifest
+from wobsite_proc.profiling import ProfileEvent, Profiler
+
+# Parsing and rendering pull in lxml and markdown_it, which are imported once a page actually needs compiling
+if TYPE_CHECKING:
+    from wobsite_proc.template import TemplateCache, TemplateSkeleton
+
+@dataclass
+class BuildContext:
+    site_dir: Path
+    output_dir: Path
+    templates: Dict[str, TemplateManifest]
+    previous_state: BuildState
+    profile: bool = False
+    io_threads: int = 0
+    io_window: int = DEFAULT_WINDOW
+    minify: bool = False
+    assets: Optional[AssetMap] = None
+    macros: Dict[str, str] = field(default_factory = lambda: {})
+    # Only decide which pages need compiling, without parsing or writing them
+    dry_run: bool = False
+    # Resident set size in bytes each compiling process tries to stay under, None for no limit
+    memory_budget: Optional[int] = None
+
+@dataclass
+class PageResult:
+    key: str
+    ok: bool = True
+    compiled: bool = False
+    # Found stale while only checking fingerprints, so the page is left for a worker to compile
+    deferred: bool = False
+    record: Optional[PageRecord] = None
+    template_cache_hits: int = 0
+    template_cache_misses: int = 0
+    minified_bytes: int = 0
+    messages: List[str] = field(default_factory = lambda: [])
+    events: List[ProfileEvent] = field(default_factory = lambda: [])
+
+class BuildSession:
+    state: Optional[BuildState]
+    hasher: FileHasher
+    discovery: Optional[DiscoveryIndex]
+    __templates: Optional["TemplateCache"]
+
+    def __init__(self) -> None:
+        self.state = None
+        self.hasher = FileHasher()
+        self.discovery = None
+        self.__templates = None
+
+    @property
+    def templates(self) -> "TemplateCache":
+        if self.__templates is None:
+            from wobsite_proc.template import TemplateCache
+            self.__templates = TemplateCache()
+
+        return self.__templates
+
+    @property
+    def has_templates(self) -> bool:
+        return self.__templates is not None
+
+    def invalidate(self, paths: Set[Path]) -> None:
+        self.hasher.invalidate(paths)
+
+        if self.__templates is not None:
+            self.__templates.invalidate(paths)
+
+class PageCompiler:
+    context: BuildContext
+    session: BuildSession
+    profiler: Profiler
+    io: FileIO
+    __site_macros: MacroTable
+    __template_macros: Dict[str, MacroTable]
+    __slot_values: Dict[str, Dict[str, bytes]]
+    __budget: Optional[MemoryBudget]
+    __templates_ready: bool
+    __markdown: bool
+    __check_only: bool
+
+    def __init__(self, context: BuildContext, session: Optional[BuildSession] = None) -> None:
+        self.context = context
+        self.session = BuildSession() if session is None else session
+        self.profiler = Profiler(context.profile)
+        self.io = FileIO()
+        self.__site_macros = make_table(context.macros)
+        self.__template_macros = {}
+        self.__slot_values = {}
+        self.__budget = MemoryBudget(context.memory_budget) if context.memory_budget is not None else None
+        self.__templates_ready = False
+        self.__markdown = False
+        self.__check_only = False
+
+    @property
+    def hasher(self) -> FileHasher:
+        return self.session.hasher
+
+    @property
+    def templates(self) -> "TemplateCache":
+        templates = self.session.templates
+
+        if not self.__templates_ready:
+            templates.minify = self.context.minify
+            templates.use_assets(self.context.assets)
+            self.__templates_ready = True
+
+        return templates
+
+    # Compiles the pages in order while reading the inputs of the next io_window pages ahead and writing outputs behind
+    def compile_all(self, jobs: List[PageManifest]) -> Iterable[PageResult]:
+        with FileIO(self.context.io_threads, self.context.io_window) as io:
+            self.io = io
+
+            try:
+                for p in jobs[:io.window]:
+                    self.__prefetch(p)
+
+                last = None
+
+                for i, p in enumerate(jobs):
+                    if i + io.window < len(jobs):
+                        self.__prefetch(jobs[i + io.window])
+
+                    if last is not None:
+                        yield last
+                    last = self.compile(p)
+
+                failures = io.flush()
+
+                # Spans of the writes still pending after the last page are reported with it
+                if last is not None:
+                    last.events.extend(self.profiler.drain())
+                    yield last
+
+                for path, e in failures:
+                    yield PageResult(
+                        key = path.relative_to(self.context.output_dir).as_posix(),
+                        ok = False,
+                        messages = [f"Error: Could not write {path}: {e}"]
+                    )
+            finally:
+                self.io = FileIO()
+
+    # Checks the fingerprints of the pages without compiling any, yielding the results of those that need no compiling
+    # and adding the rest to stale
+    def check_all(self, jobs: List[PageManifest], stale: List[PageManifest]) -> Iterable[PageResult]:
+        self.__check_only = True
+
+        try:
+            for i, r in enumerate(self.compile_all(jobs)):
+                if r.deferred:
+                    stale.append(jobs[i])
+                else:
+                    yield r
+        finally:
+            self.__check_only = False
+
+    def compile(self, p: PageManifest) -> PageResult:
+        result = PageResult(key = p.path.relative_to(self.context.site_dir).as_posix())
+        log = Log(print_delegate = result.messages.append)
+        hits, misses = self.__template_counts()
+
+        if self.__budget is not None:
+            rss = self.__budget.check(self.__release)
+
+            if rss is not None:
+                log.warn(f"Memory budget of {self.__budget.limit // 2**20} MiB exceeded ({rss // 2**20} MiB in use) after releasing caches")
+
+        start = time.perf_counter_ns()
+
+        try:
+            self.__compile(p, result, log)
+        except Exception as e:
+            log.err(f"Could not compile page {p.path}: {e}")
+            result.ok = False
+
+        if result.compiled and result.record is not None and not self.context.dry_run:
+            result.record.cost_ns = time.perf_counter_ns() - start
+
+        hits_after, misses_after = self.__template_counts()
+        result.template_cache_hits = hits_after - hits
+        result.template_cache_misses = misses_after - misses
+        result.events = self.profiler.drain()
+
+        return result
+
+    def __compile(self, p: PageManifest, result: PageResult, log: Log) -> None:
+        key = result.key
+        phase = self.profiler.phase
+
+        rpath = page_manifest.output_path(p)
+
+        p_template = None
+        if p.template is not None:
+            if p.template not in self.context.templates:
+                log.err(f"Template {p.template} required by page {p.path} not found")
+                result.ok = False
+                return
+
+            p_template = self.context.templates[p.template]
+
+        macros = self.__macros(p_template).extend(p.macros)
+
+        with phase("read", key):
+            content_path = p.dir / p.file
+
+            data = None
+            if not self.hasher.is_hashed(content_path):
+                data = self.io.read(content_path)
+                self.hasher.add(content_path, data)
+
+            if not self.hasher.is_hashed(p.path):
+                self.hasher.add(p.path, self.io.read(p.path))
+
+        with phase("fingerprint", key):
+
+            result.record = PageRecord(
+                output = rpath.as_posix(),
+                fingerprint = self.hasher.page_fingerprint(p, p_template, self.__salt(macros))
+            )
+            opath = self.context.output_dir / rpath
+
+            previous = self.context.previous_state.pages.get(key)
+
+            if previous is not None and (previous.output, previous.fingerprint) == (result.record.output, result.record.fingerprint) and opath.is_file():
+                result.record.cost_ns = previous.cost_ns
+                return
+
+        if self.context.dry_run:
+            result.compiled = True
+            return
+
+        if self.__check_only:
+            result.deferred = True
+            return
+
+        from wobsite_proc import page, template
+        from wobsite_proc.asset_hash import rewrite_references
+        from wobsite_proc.macro import expand
+        from wobsite_proc.minify import minify_tree
+
+        if page_manifest.is_markdown(p) and not self.__markdown:
+            self.__markdown = True
+
+            # Under a budget, rendered Markdown trees are not kept after their page is written
+            if self.__budget is not None:
+                from wobsite_proc import markdown
+                markdown.shared_renderer().cache_size = 0
+
+        with phase("parse", key):
+            cpage = page.parse(p, data)
+
+        base = rpath.parent.as_posix()
+
+        if self.context.assets is not None:
+            with phase("assets", key):
+                rewrite_references(cpage.content, base, self.context.assets)
+
+        if self.context.minify:
+            with phase("minify", key):
+                result.minified_bytes += minify_tree(cpage.content)
+
+        with phase("macros", key):
+            expand(cpage.content, macros, log)
+
+        opath.parent.mkdir(parents = True, exist_ok = True)
+
+        if p_template is None:
+            self.__write(opath, key, "serialize", cpage.write)
+            log.info(f"Compiled templateless page {p.path}")
+        else:
+            with phase("template", key):
+                skeleton = self.templates.skeleton(p_template, base)
+
+            if skeleton is not None:
+                if not skeleton.has_slot(template.PAGE_CONTENT_ELEMENT):
+                    template.warn_missing_content(p_template, log)
+
+                result.minified_bytes += skeleton.minified or 0
+
+                with phase("serialize", key):
+                    content = cpage.to_bytes()
+
+                values = { **self.__macro_values(skeleton, macros, p, log), template.PAGE_CONTENT_ELEMENT: content }
+                self.__write(opath, key, "write", lambda o: skeleton.write(o, values))
+            else:
+                with phase("template", key):
+                    ctemplate = self.templates.get(p_template, base)
+                result.minified_bytes += ctemplate.minified or 0
+
+                with phase("macros", key):
+                    expand(ctemplate.document, macros, log)
+                with phase("substitute", key):
+                    ctemplate.substitute_content(cpage.content, log)
+                self.__write(opath, key, "serialize", ctemplate.write)
+
+            log.info(f"Compiled page {p.path} with template {p_template.name}")
+
+        result.compiled = True
+
+    # Outputs are written on a writer thread when there is one, so their span is recorded there. Trees are serialized
+    # straight into their file, so their serialize span covers the write as well.
+    def __write(self, path: Path, key: str, name: str, stream: Callable[[Path], None]) -> None:
+        phase = self.profiler.phase
+
+        def write(o: Path) -> None:
+            with phase(name, key):
+                stream(o)
+
+        self.io.write(path, write)
+
+    # Everything here is rebuilt on demand, at the cost of re-reading templates and re-hashing inputs
+    def __release(self) -> None:
+        if self.session.has_templates:
+            self.session.templates.clear()
+        self.hasher.clear()
+        self.__slot_values.clear()
+
+        if self.__markdown:
+            from wobsite_proc import markdown
+            markdown.shared_renderer().clear()
+
+    def __template_counts(self) -> Tuple[int, int]:
+        if not self.session.has_templates:
+            return 0, 0
+
+        return self.session.templates.hits, self.session.templates.misses
+
+    # Site and template macros are merged once per template for the whole build
+    def __macros(self, manifest: Optional[TemplateManifest]) -> MacroTable:
+        if manifest is None:
+            return self.__site_macros
+
+        table = self.__template_macros.get(manifest.name)
+
+        if table is None:
+            table = self.__site_macros.extend(manifest.macros)
+            self.__template_macros[manifest.name] = table
+
+        return table
+
+    # Slot values of pages without macros of their own are the same for every page of a template. Values with an
+    # undefined macro are not kept, so that every page using them reports it
+    def __macro_values(self, skeleton: "TemplateSkeleton", macros: MacroTable, p: PageManifest, log: Log) -> Dict[str, bytes]:
+        from wobsite_proc.template import macro_slot
+
+        if not skeleton.macros:
+            return {}
+
+        values = None if p.macros else self.__slot_values.get(skeleton.manifest.name)
+
+        if values is None:
+            values = { macro_slot(k): macros.get_bytes(k, log) for k in skeleton.macros }
+
+            if not p.macros and all(k in macros.values for k in skeleton.macros):
+                self.__slot_values[skeleton.manifest.name] = values
+
+        return values
+
+    def __salt(self, macros: MacroTable) -> str:
+        parts: List[str] = []
+
+        if self.context.minify:
+            parts.append("minify")
+        if self.context.assets is not None:
+            parts.append(f"assets:{self.context.assets.digest}")
+        if macros.digest:
+            parts.append(f"macros:{macros.digest}")
+
+        return ",".join(parts)
+
+    def __prefetch(self, p: PageManifest) -> None:
+        for path in [p.dir / p.file, p.path]:
+            if not self.hasher.is_hashed(path):
+                self.io.prefetch(path)
+
+__worker_compiler: Optional[PageCompiler] = None
+
+def __init_worker(context: BuildContext) -> None:
+    global __worker_compiler
+    __worker_compiler = PageCompiler(context)
+
+def __compile_in_worker(jobs: List[PageManifest]) -> List[PageResult]:
+    assert __worker_compiler is not None
+    return list(__worker_compiler.compile_all(jobs))
+
+def compile_pages(jobs: List[PageManifest], context: BuildContext, workers: int, session: Optional[BuildSession] = None) -> Iterable[PageResult]:
+    workers = min(workers, len(jobs))
+
+    # A session keeps its caches warm in this process, so it is always compiled against in-process
+    if workers <= 1 or session is not None:
+        yield from PageCompiler(context, session).compile_all(jobs)
+        return
+
+    # Unchanged pages are skipped here, so that a build with nothing to compile never starts the pool
+    compiler = PageCompiler(context)
+    stale: List[PageManifest] = []
+    yield from compiler.check_all(jobs, stale)
+
+    workers = min(workers, len(stale))
+
+    if workers <= 1:
+        yield from compiler.compile_all(stale)
+        return
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    # Workers are handed whole chunks so that each can read ahead within its chunk
+    chunksize = max(1, len(stale) // (workers * 4))
+    chunks = [stale[i:i + chunksize] for i in range(0, len(stale), chunksize)]
+
+    with ProcessPoolExecutor(max_workers = workers, initializer = __init_worker, initargs = (context,)) as executor:
+        for results in executor.map(__compile_in_worker, chunks):
+            yield from results
@@ -0,0 +1,129 @@
+from dataclasses import dataclass, field
+import hashlib
+import json
+from pathlib import Path
+from typing import Any, Dict, Final, Optional, Set
+
+from wobsite_proc.deps import page_inputs
+from wobsite_proc.manifests.page import PageManifest
+from wobsite_proc.manifests.template import TemplateManifest
+
+FILE_NAME: Final[str] = "build_state.json"
+VERSION: Final[int] = 1
+
+@dataclass
+class PageRecord:
+    output: str
+    fingerprint: str
+    # Wall time the page last took to compile, used to estimate planned builds
+    cost_ns: int = 0
+
+@dataclass
+class CompressedRecord:
+    size: int
+    mtime_ns: int
+    sha256: str
+    compressed_size: int
+
+@dataclass
+class AssetHashRecord:
+    size: int
+    mtime_ns: int
+    sha256: str
+
+@dataclass
+class BuildState:
+    pages: Dict[str, PageRecord] = field(default_factory = lambda: {})
+    compressed: Dict[str, CompressedRecord] = field(default_factory = lambda: {})
+    asset_hashes: Dict[str, AssetHashRecord] = field(default_factory = lambda: {})
+    # Digest of everything the saved dependency graph was built from
+    deps_key: str = ""
+
+class FileHasher:
+    __hashes: Dict[Path, str]
+
+    def __init__(self) -> None:
+        self.__hashes = {}
+
+    def hash(self, path: Path) -> str:
+        if path not in self.__hashes:
+            with path.open("rb") as file:
+                self.__hashes[path] = hashlib.file_digest(file, "sha256").hexdigest()
+
+        return self.__hashes[path]
+
+    def is_hashed(self, path: Path) -> bool:
+        return path in self.__hashes
+
+    # Records the hash of contents the caller already read, so the file is not read a second time
+    def add(self, path: Path, data: bytes) -> None:
+        self.__hashes[path] = hashlib.sha256(data).hexdigest()
+
+    def invalidate(self, paths: Set[Path]) -> None:
+        for p in paths:
+            self.__hashes.pop(p, None)
+
+    def clear(self) -> None:
+        self.__hashes.clear()
+
+    # salt carries build settings that change the output without changing any input file
+    def page_fingerprint(self, manifest: PageManifest, template: Optional[TemplateManifest], salt: str = "") -> str:
+        parts = [str(VERSION)] + [self.hash(p) for p in page_inputs(manifest, template)]
+
+        if salt:
+            parts.append(salt)
+
+        return hashlib.sha256("\0".join(parts).encode()).hexdigest()
+
+def load(path: Path) -> BuildState:
+    try:
+        with path.open("rb") as file:
+            data: Dict[str, Any] = json.load(file)
+    except (OSError, ValueError):
+        return BuildState()
+
+    if data.get("version") != VERSION:
+        return BuildState()
+
+    return BuildState(
+        pages = {
+            k: PageRecord(output = v["output"], fingerprint = v["fingerprint"], cost_ns = v.get("cost_ns", 0)) for k, v in data["pages"].items()
+        },
+        compressed = {
+            k: CompressedRecord(
+                size = v["size"],
+                mtime_ns = v["mtime_ns"],
+                sha256 = v["sha256"],
+                compressed_size = v["compressed_size"]
+            ) for k, v in data.get("compressed", {}).items()
+        },
+        asset_hashes = {
+            k: AssetHashRecord(size = v["size"], mtime_ns = v["mtime_ns"], sha256 = v["sha256"]) for k, v in data.get("asset_hashes", {}).items()
+        },
+        deps_key = data.get("deps_key", "")
+    )
+
+def save(state: BuildState, path: Path) -> None:
+    path.parent.mkdir(parents = True, exist_ok = True)
+
+    data = {
+        "version": VERSION,
+        "pages": {
+            k: { "output": v.output, "fingerprint": v.fingerprint, "cost_ns": v.cost_ns } for k, v in state.pages.items()
+        },
+        "compressed": {
+            k: {
+                "size": v.size,
+                "mtime_ns": v.mtime_ns,
+                "sha256": v.sha256,
+                "compressed_size": v.compressed_size
+            } for k, v in state.compressed.items()
+        },
+        "asset_hashes": {
+            k: { "size": v.size, "mtime_ns": v.mtime_ns, "sha256": v.sha256 } for k, v in state.asset_hashes.items()
+        },
+        "deps_key": state.deps_key
+    }
+
+    with path.open("wt") as file:
+        json.dump(data, file)
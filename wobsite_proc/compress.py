@@ -0,0 +1,96 @@
+import hashlib
+import os
+from pathlib import Path
+from typing import Dict, Final, List, Optional, Set, Tuple
+
+from wobsite_proc.build_state import CompressedRecord
+from wobsite_proc.log import Log
+from wobsite_proc.summary import BuildSummary
+
+SUFFIX: Final[str] = ".gz"
+
+COMPRESSIBLE_SUFFIXES: Final[List[str]] = [
+    ".html", ".htm", ".css", ".js", ".mjs", ".json", ".svg", ".xml", ".txt", ".md", ".map", ".ico", ".ttf", ".otf"
+]
+
+DEFAULT_MIN_SIZE: Final[int] = 1024
+DEFAULT_LEVEL: Final[int] = 9
+
+# Writes a .gz sibling for every compressible output, recompressing only outputs whose content changed.
+# Returns the records of this build keyed like the outputs, and adds the sidecars to live.
+def precompress(
+    output_dir: Path,
+    live: Set[Path],
+    previous: Dict[str, CompressedRecord],
+    min_size: int,
+    level: int,
+    workers: int,
+    summary: BuildSummary,
+    log: Log
+) -> Dict[str, CompressedRecord]:
+    from concurrent.futures import ThreadPoolExecutor
+
+    candidates = sorted(p for p in live if p.suffix.lower() in COMPRESSIBLE_SUFFIXES)
+
+    def compress(p: Path) -> Tuple[Optional[CompressedRecord], bool]:
+        return __compress(p, previous.get(p.relative_to(output_dir).as_posix()), min_size, level)
+
+    # zlib releases the GIL while compressing, so threads are enough to use every core
+    with ThreadPoolExecutor(max_workers = max(1, workers)) as executor:
+        results = list(executor.map(compress, candidates))
+
+    records: Dict[str, CompressedRecord] = {}
+
+    for p, (record, compressed) in zip(candidates, results):
+        if record is None:
+            continue
+
+        records[p.relative_to(output_dir).as_posix()] = record
+        live.add(__sidecar(p))
+
+        if compressed:
+            log.info(f"Compressed {p}")
+            summary.gzip_compressed += 1
+            summary.gzip_bytes_in += record.size
+            summary.gzip_bytes_out += record.compressed_size
+        else:
+            summary.gzip_skipped += 1
+
+    return records
+
+# The sidecars a build would keep or write for live, before the outputs exist to be measured
+def planned_sidecars(live: Set[Path]) -> Set[Path]:
+    return { __sidecar(p) for p in live if p.suffix.lower() in COMPRESSIBLE_SUFFIXES }
+
+def __compress(path: Path, previous: Optional[CompressedRecord], min_size: int, level: int) -> Tuple[Optional[CompressedRecord], bool]:
+    st = path.stat()
+
+    if st.st_size < min_size:
+        return None, False
+
+    sidecar = __sidecar(path)
+    has_sidecar = sidecar.is_file()
+
+    if previous is not None and has_sidecar and (previous.size, previous.mtime_ns) == (st.st_size, st.st_mtime_ns):
+        return previous, False
+
+    data = path.read_bytes()
+    digest = hashlib.sha256(data).hexdigest()
+
+    # Full builds rewrite every page, so an unchanged output is recognized by its content rather than its mtime
+    if previous is not None and has_sidecar and previous.sha256 == digest:
+        return CompressedRecord(st.st_size, st.st_mtime_ns, digest, previous.compressed_size), False
+
+    import gzip
+
+    # mtime = 0 keeps the sidecar byte-identical for identical content
+    compressed = gzip.compress(data, compresslevel = level, mtime = 0)
+
+    tmp = sidecar.with_name(f"{sidecar.name}.tmp")
+    tmp.write_bytes(compressed)
+    os.replace(tmp, sidecar)
+
+    return CompressedRecord(st.st_size, st.st_mtime_ns, digest, len(compressed)), True
+
+def __sidecar(path: Path) -> Path:
+    return path.with_name(path.name + SUFFIX)
@@ -0,0 +1,122 @@
+from dataclasses import dataclass, field
+import hashlib
+import json
+from pathlib import Path
+import posixpath
+from typing import Any, Dict, Final, List, Optional, Set
+
+from wobsite_proc.manifests.page import PageManifest
+from wobsite_proc.manifests.template import TemplateManifest
+
+FILE_NAME: Final[str] = "deps.json"
+VERSION: Final[int] = 1
+
+@dataclass
+class DependencyGraph:
+    # Site-relative POSIX path of each input to the output-relative paths of the pages built from it
+    inputs: Dict[str, List[str]] = field(default_factory = lambda: {})
+    # Site-relative asset directories; their files are copied to the same relative path in the output
+    asset_dirs: List[str] = field(default_factory = lambda: [])
+    # Output-relative asset path to the name it is written to, when assets are content-hashed
+    asset_names: Optional[Dict[str, str]] = None
+    # Output-relative path of the manifest listing the hashed names
+    asset_manifest: Optional[str] = None
+    # Output-relative paths of outputs with a precompressed sidecar
+    compressed: List[str] = field(default_factory = lambda: [])
+
+# Every file whose contents a compiled page depends on, in a stable order
+def page_inputs(manifest: PageManifest, template: Optional[TemplateManifest]) -> List[Path]:
+    inputs = manifest.defaults + [manifest.path]
+
+    if not manifest.front_matter:
+        inputs.append(manifest.dir / manifest.file)
+
+    if template is not None:
+        inputs.append(template.path)
+        inputs.append(template.dir / template.file)
+
+    return inputs
+
+# Digest of the paths the graph is built from. Contents do not matter, so it is equal across no-change builds
+# and the graph need not be rebuilt. Absolute paths are used as they are, relative_to is comparatively slow.
+def graph_key(
+    manifest_path: Path,
+    page_inputs: List[List[Path]],
+    outputs: Dict[str, str],
+    asset_paths: List[Path],
+    asset_names: Optional[Dict[str, str]],
+    compressed: List[str]
+) -> str:
+    parts = [str(VERSION), str(manifest_path)]
+
+    for inputs in page_inputs:
+        parts.append("\1".join(str(i) for i in inputs))
+
+    parts.append(json.dumps(outputs, sort_keys = True))
+    parts.append("\1".join(str(p) for p in asset_paths))
+    parts.append(json.dumps(asset_names, sort_keys = True))
+    parts.append("\1".join(sorted(compressed)))
+
+    return hashlib.sha256("\0".join(parts).encode()).hexdigest()
+
+def add_page(graph: DependencyGraph, inputs: List[Path], output: str, site_dir: Path) -> None:
+    for i in inputs:
+        graph.inputs.setdefault(i.relative_to(site_dir).as_posix(), []).append(output)
+
+# Outputs affected by a change to file, a site-relative POSIX path
+def dependents(graph: DependencyGraph, file: str) -> List[str]:
+    outputs: Set[str] = set(graph.inputs.get(file, []))
+
+    for d in graph.asset_dirs:
+        if not file.startswith(d + "/"):
+            continue
+
+        rel = posixpath.relpath(file, d)
+
+        if graph.asset_names is None:
+            outputs.add(rel)
+            continue
+
+        # A hashed name is written into every page that references it, so all pages depend on every asset
+        outputs.add(graph.asset_names.get(rel, rel))
+        if graph.asset_manifest is not None:
+            outputs.add(graph.asset_manifest)
+        outputs.update(o for pages in graph.inputs.values() for o in pages)
+
+    compressed = set(graph.compressed)
+    outputs.update([o + ".gz" for o in outputs if o in compressed])
+
+    return sorted(outputs)
+
+def load(path: Path) -> Optional[DependencyGraph]:
+    try:
+        with path.open("rb") as file:
+            data: Dict[str, Any] = json.load(file)
+    except (OSError, ValueError):
+        return None
+
+    if data.get("version") != VERSION:
+        return None
+
+    return DependencyGraph(
+        inputs = data["inputs"],
+        asset_dirs = data["asset_dirs"],
+        asset_names = data["asset_names"],
+        asset_manifest = data["asset_manifest"],
+        compressed = data["compressed"]
+    )
+
+def save(graph: DependencyGraph, path: Path) -> None:
+    path.parent.mkdir(parents = True, exist_ok = True)
+
+    data = {
+        "version": VERSION,
+        "inputs": graph.inputs,
+        "asset_dirs": graph.asset_dirs,
+        "asset_names": graph.asset_names,
+        "asset_manifest": graph.asset_manifest,
+        "compressed": graph.compressed
+    }
+
+    with path.open("wt") as file:
+        json.dump(data, file)
@@ -0,0 +1,264 @@
+from dataclasses import dataclass, field
+import fnmatch
+import json
+import os
+from pathlib import Path
+import time
+import tomllib
+from typing import Any, Dict, Final, List, Optional, Set
+
+from wobsite_proc.manifests.page import FRONT_MATTER_DELIMITER, split_front_matter
+from wobsite_proc.summary import BuildSummary
+from wobsite_proc.toml_utils import TomlTable
+
+FILE_NAME: Final[str] = "discover_index.json"
+VERSION: Final[int] = 2
+
+MANIFEST_SUFFIX: Final[str] = ".toml"
+DEFAULTS_FILE_NAME: Final[str] = "_defaults.toml"
+FRONT_MATTER_SUFFIXES: Final[List[str]] = [".html", ".htm", ".md", ".markdown"]
+
+IGNORE_PATTERNS: Final[List[str]] = [
+    ".git", ".hg", ".svn", ".output", ".output-shard-*", ".wobsite-cache",
+    "*~", ".*.sw?", ".#*", "#*#", "*.tmp"
+]
+
+# Entries modified this recently may change again within the same mtime tick, so they are not trusted on the next scan
+RACY_NS: Final[int] = 2_000_000_000
+
+@dataclass
+class DirRecord:
+    mtime_ns: int
+    manifests: List[str]
+    contents: List[str]
+    dirs: List[str]
+    defaults: bool
+
+# toml is None for a content file without front matter
+@dataclass
+class ManifestRecord:
+    mtime_ns: int
+    size: int
+    toml: Optional[TomlTable]
+
+@dataclass
+class PageSource:
+    path: Path
+    defaults: List[Path]
+    front_matter: bool
+
+@dataclass
+class DiscoveryIndex:
+    ignore: List[str] = field(default_factory = lambda: [])
+    dirs: Dict[str, DirRecord] = field(default_factory = lambda: {})
+    manifests: Dict[str, ManifestRecord] = field(default_factory = lambda: {})
+    dirty: bool = False
+
+class Discovery:
+    index: DiscoveryIndex
+    summary: BuildSummary
+    __seen_dirs: Set[str]
+    __seen_manifests: Set[str]
+
+    def __init__(self, index: DiscoveryIndex, ignore: List[str], summary: BuildSummary) -> None:
+        if index.ignore != ignore:
+            index = DiscoveryIndex(ignore = ignore, dirty = True)
+
+        self.index = index
+        self.summary = summary
+        self.__seen_dirs = set()
+        self.__seen_manifests = set()
+
+    def find_manifests(self, dir: Path) -> List[Path]:
+        found: List[PageSource] = []
+        self.__walk(dir, [], found)
+        return [s.path for s in found if not s.front_matter]
+
+    # Page manifests and the content files that may carry front matter, with the directory defaults above each
+    def find_pages(self, dir: Path) -> List[PageSource]:
+        found: List[PageSource] = []
+        self.__walk(dir, [], found)
+        return found
+
+    def load_toml(self, path: Path) -> TomlTable:
+        toml = self.__load(path, False)
+        assert toml is not None
+        return toml
+
+    def load_front_matter(self, path: Path) -> Optional[TomlTable]:
+        return self.__load(path, True)
+
+    def __load(self, path: Path, front_matter: bool) -> Optional[TomlTable]:
+        key = str(path)
+        record = self.index.manifests.get(key)
+
+        # Directory defaults are shared by every page beneath them, so they are only checked once per build
+        if key in self.__seen_manifests and record is not None:
+            return record.toml
+
+        self.__seen_manifests.add(key)
+        st = path.stat()
+
+        if record is not None and record.mtime_ns == st.st_mtime_ns and record.size == st.st_size:
+            if record.toml is not None:
+                self.summary.manifests_reused += 1
+            return record.toml
+
+        if front_matter:
+            toml = self.__read_front_matter(path)
+        else:
+            with path.open("rb") as file:
+                toml = tomllib.load(file)
+
+        self.index.manifests[key] = ManifestRecord(
+            mtime_ns = self.__trusted_mtime(st.st_mtime_ns),
+            size = st.st_size,
+            toml = toml
+        )
+        self.index.dirty = True
+
+        if toml is not None:
+            self.summary.manifests_parsed += 1
+
+        return toml
+
+    def __read_front_matter(self, path: Path) -> Optional[TomlTable]:
+        delimiter = FRONT_MATTER_DELIMITER.encode()
+
+        # Most content files of two-file pages are rejected after reading the first few bytes
+        with path.open("rb") as file:
+            head = file.read(len(delimiter))
+            if head != delimiter:
+                return None
+
+            front, _ = split_front_matter((head + file.read()).decode())
+
+        return tomllib.loads(front) if front is not None else None
+
+    # Drops the records of directories and manifests that were not visited, so deleted files do not accumulate
+    def prune(self) -> DiscoveryIndex:
+        for k in self.index.dirs.keys() - self.__seen_dirs:
+            del self.index.dirs[k]
+            self.index.dirty = True
+
+        for k in self.index.manifests.keys() - self.__seen_manifests:
+            del self.index.manifests[k]
+            self.index.dirty = True
+
+        return self.index
+
+    def __walk(self, dir: Path, defaults: List[Path], found: List[PageSource]) -> None:
+        key = str(dir)
+
+        try:
+            mtime_ns = os.stat(dir).st_mtime_ns
+        except OSError:
+            return
+
+        self.__seen_dirs.add(key)
+        record = self.index.dirs.get(key)
+
+        # A directory's mtime only changes when entries are added, removed or renamed in it, so an unchanged
+        # directory keeps its listing, but its subdirectories are still checked
+        if record is None or record.mtime_ns != mtime_ns:
+            record = self.__scan(dir, mtime_ns)
+            self.index.dirs[key] = record
+            self.index.dirty = True
+            self.summary.dirs_scanned += 1
+        else:
+            self.summary.dirs_reused += 1
+
+        if record.defaults:
+            defaults = defaults + [dir / DEFAULTS_FILE_NAME]
+
+        found.extend(PageSource(path = dir / m, defaults = defaults, front_matter = False) for m in record.manifests)
+        found.extend(PageSource(path = dir / c, defaults = defaults, front_matter = True) for c in record.contents)
+
+        for d in record.dirs:
+            self.__walk(dir / d, defaults, found)
+
+    def __scan(self, dir: Path, mtime_ns: int) -> DirRecord:
+        record = DirRecord(mtime_ns = self.__trusted_mtime(mtime_ns), manifests = [], contents = [], dirs = [], defaults = False)
+
+        try:
+            entries = sorted(os.scandir(dir), key = lambda e: e.name)
+        except OSError:
+            return record
+
+        for e in entries:
+            if is_ignored(e.name, self.index.ignore):
+                continue
+
+            if e.is_dir(follow_symlinks = False):
+                record.dirs.append(e.name)
+            elif not e.is_file():
+                continue
+            elif e.name == DEFAULTS_FILE_NAME:
+                record.defaults = True
+            elif e.name.lower().endswith(MANIFEST_SUFFIX):
+                record.manifests.append(e.name)
+            elif os.path.splitext(e.name)[1].lower() in FRONT_MATTER_SUFFIXES:
+                record.contents.append(e.name)
+
+        return record
+
+    def __trusted_mtime(self, mtime_ns: int) -> int:
+        return mtime_ns if time.time_ns() - mtime_ns > RACY_NS else 0
+
+def is_ignored(name: str, patterns: List[str]) -> bool:
+    return any(fnmatch.fnmatchcase(name, p) for p in patterns)
+
+def load(path: Path) -> DiscoveryIndex:
+    try:
+        with path.open("rb") as file:
+            data: Dict[str, Any] = json.load(file)
+    except (OSError, ValueError):
+        return DiscoveryIndex()
+
+    if data.get("version") != VERSION:
+        return DiscoveryIndex()
+
+    return DiscoveryIndex(
+        ignore = data["ignore"],
+        dirs = {
+            k: DirRecord(
+                mtime_ns = v["mtime_ns"],
+                manifests = v["manifests"],
+                contents = v["contents"],
+                dirs = v["dirs"],
+                defaults = v["defaults"]
+            ) for k, v in data["dirs"].items()
+        },
+        manifests = {
+            k: ManifestRecord(mtime_ns = v["mtime_ns"], size = v["size"], toml = v["toml"]) for k, v in data["manifests"].items()
+        }
+    )
+
+def save(index: DiscoveryIndex, path: Path) -> None:
+    if not index.dirty:
+        return
+
+    path.parent.mkdir(parents = True, exist_ok = True)
+
+    data = {
+        "version": VERSION,
+        "ignore": index.ignore,
+        "dirs": {
+            k: {
+                "mtime_ns": v.mtime_ns,
+                "manifests": v.manifests,
+                "contents": v.contents,
+                "dirs": v.dirs,
+                "defaults": v.defaults
+            } for k, v in index.dirs.items()
+        },
+        "manifests": {
+            k: { "mtime_ns": v.mtime_ns, "size": v.size, "toml": v.toml } for k, v in index.manifests.items()
+        }
+    }
+
+    # TOML dates and times are not JSON types; manifests only read strings, so storing them as text is harmless
+    with path.open("wt") as file:
+        json.dump(data, file, default = str)
+
+    index.dirty = False
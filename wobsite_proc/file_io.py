@@ -0,0 +1,84 @@
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Deque, Dict, Final, List, Optional, Tuple
+
+DEFAULT_THREADS: Final[int] = 8
+DEFAULT_WINDOW: Final[int] = 32
+
+# Reads files ahead of the compile step and writes outputs behind it on a thread pool, so that file latency
+# overlaps with parsing and serialization. With no threads every operation runs synchronously on the caller.
+class FileIO:
+    threads: int
+    window: int
+    __executor: Optional[ThreadPoolExecutor]
+    __reads: Dict[Path, Future[bytes]]
+    __writes: Deque[Tuple[Path, Future[None]]]
+    __failures: List[Tuple[Path, Exception]]
+
+    def __init__(self, threads: int = 0, window: int = DEFAULT_WINDOW) -> None:
+        self.threads = threads
+        self.window = max(1, window)
+        self.__executor = ThreadPoolExecutor(max_workers = threads, thread_name_prefix = "wobsite-io") if threads > 0 else None
+        self.__reads = {}
+        self.__writes = deque()
+        self.__failures = []
+
+    def __enter__(self) -> "FileIO":
+        return self
+
+    def __exit__(self, *_: object) -> None:
+        self.close()
+
+    def prefetch(self, path: Path) -> None:
+        if self.__executor is None or path in self.__reads:
+            return
+
+        self.__reads[path] = self.__executor.submit(path.read_bytes)
+
+    def read(self, path: Path) -> bytes:
+        future = self.__reads.pop(path, None)
+
+        if future is None:
+            return path.read_bytes()
+
+        return future.result()
+
+    # The output is streamed straight into the file, on a writer thread if there are any. The tree or values
+    # stream writes from must not change until the write is flushed.
+    def write(self, path: Path, stream: Callable[[Path], None]) -> None:
+        if self.__executor is None:
+            stream(path)
+            return
+
+        # Bound the outputs held in memory while waiting to be written
+        while len(self.__writes) >= self.window:
+            self.__wait(*self.__writes.popleft())
+
+        self.__writes.append((path, self.__executor.submit(stream, path)))
+
+    # Waits for every pending write and returns the ones that failed since the last flush
+    def flush(self) -> List[Tuple[Path, Exception]]:
+        while self.__writes:
+            self.__wait(*self.__writes.popleft())
+
+        failures = self.__failures
+        self.__failures = []
+        return failures
+
+    def close(self) -> None:
+        self.flush()
+
+        for future in self.__reads.values():
+            future.cancel()
+        self.__reads.clear()
+
+        if self.__executor is not None:
+            self.__executor.shutdown()
+            self.__executor = None
+
+    def __wait(self, path: Path, future: Future[None]) -> None:
+        try:
+            future.result()
+        except Exception as e:
+            self.__failures.append((path, e))
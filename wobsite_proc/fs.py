@@ -0,0 +1,24 @@
+import os
+from pathlib import Path
+from typing import Callable, Iterator, Optional, Tuple
+
+# skip is given the name of each file and directory; skipped directories are not descended into
+def walk_files(dir: Path, skip: Optional[Callable[[str], bool]] = None) -> Iterator[Tuple[Path, os.stat_result]]:
+    try:
+        entries = list(os.scandir(dir))
+    except OSError:
+        return
+
+    for e in entries:
+        if skip is not None and skip(e.name):
+            continue
+
+        if e.is_dir(follow_symlinks = False):
+            yield from walk_files(Path(e.path), skip)
+        elif e.is_file():
+            yield Path(e.path), e.stat()
+
+def remove_empty_dirs(dir: Path) -> None:
+    for root, _, _ in os.walk(dir, topdown = False):
+        if root != str(dir) and not os.listdir(root):
+            os.rmdir(root)
@@ -7,10 +7,10 @@ class Log:
     indent_str = "  "
     indent_count = 0
 
-    def indent(self):
+    def indent(self) -> None:
         self.indent_count += 1
 
-    def outdent(self):
+    def outdent(self) -> None:
         self.indent_count -= 1
 
         if self.indent_count < 0:
@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+import hashlib
+from html import escape
+import json
+from typing import TYPE_CHECKING, Dict, Final
+
+from wobsite_proc.log import Log
+
+# Tables are built and fingerprinted before any page is parsed, so lxml is only needed for type checking here
+if TYPE_CHECKING:
+    from lxml.html import HtmlElement
+
+MACRO_PLACEHOLDER_ELEMENT: Final[str] = "wobsite-macro-placeholder"
+KEY_ATTRIBUTE: Final[str] = "key"
+
+# A flat lookup of every macro visible in a scope, so a lookup is a single dict access
+@dataclass
+class MacroTable:
+    values: Dict[str, str] = field(default_factory = lambda: {})
+    digest: str = ""
+
+    # Values of the inner scope take precedence
+    def extend(self, values: Dict[str, str]) -> "MacroTable":
+        if not values:
+            return self
+
+        return make_table({ **self.values, **values })
+
+    def get(self, key: str, log: Log) -> str:
+        value = self.values.get(key)
+
+        if value is None:
+            log.warn(f"Macro {key} is not defined")
+            return key
+
+        return value
+
+    # The value serialized as HTML text, for a template skeleton slot
+    def get_bytes(self, key: str, log: Log) -> bytes:
+        return escape(self.get(key, log), quote = False).encode()
+
+def make_table(values: Dict[str, str]) -> MacroTable:
+    digest = hashlib.sha256(json.dumps(values, sort_keys = True).encode()).hexdigest() if values else ""
+    return MacroTable(values = values, digest = digest)
+
+def key_of(placeholder: HtmlElement) -> str:
+    return placeholder.get(KEY_ATTRIBUTE, "")
+
+# Replaces every placeholder under root with the text of its value in one pass, keeping the text that follows it
+def expand(root: HtmlElement, table: MacroTable, log: Log) -> None:
+    for p in list(root.iter(MACRO_PLACEHOLDER_ELEMENT)):
+        parent = p.getparent()
+
+        if parent is None:
+            continue
+
+        text = table.get(key_of(p), log) + (p.tail or "")
+        previous = p.getprevious()
+
+        if previous is not None:
+            previous.tail = (previous.tail or "") + text
+        else:
+            parent.text = (parent.text or "") + text
+
+        parent.remove(p)
@@ -1,29 +1,76 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from pathlib import Path
 import tomllib
-from typing import Final, Optional
+from typing import Dict, Final, List, Optional, Tuple
 
-from wobsite_proc.toml_utils import OptionalTomlString, RequiredTomlString, RequiredTomlTable
+from wobsite_proc.toml_utils import OptionalTomlString, OptionalTomlTable, RequiredTomlString, RequiredTomlTable, TomlTable, strify_table
 
 KEY_PAGE_TABLE: Final[RequiredTomlTable] = RequiredTomlTable("page")
 
 KEY_FILE: Final[RequiredTomlString] = RequiredTomlString("file", KEY_PAGE_TABLE)
 KEY_TEMPLATE: Final[OptionalTomlString] = OptionalTomlString("template", KEY_PAGE_TABLE)
 
-@dataclass
+KEY_MACROS: Final[OptionalTomlTable] = OptionalTomlTable("macros")
+
+FRONT_MATTER_DELIMITER: Final[str] = "+++"
+
+MARKDOWN_EXTENSIONS: Final[List[str]] = [".md", ".markdown"]
+
+@dataclass(slots = True)
 class PageManifest:
     dir: Path
     path: Path
     file: str
     template: Optional[str]
+    front_matter: bool = False
+    macros: Dict[str, str] = field(default_factory = lambda: {})
+    # _defaults.toml files merged into the manifest, outermost first
+    defaults: List[Path] = field(default_factory = lambda: [])
 
 def parse_file(path: Path, dir: Path) -> PageManifest:
     with path.open("rb") as file:
         toml = tomllib.load(file)
 
+    return from_toml(toml, path, dir)
+
+def from_toml(toml: TomlTable, path: Path, dir: Path) -> PageManifest:
     return PageManifest(
         dir = dir,
         path = path,
         file = KEY_FILE.get_in(toml),
-        template = KEY_TEMPLATE.get_in(toml)
+        template = KEY_TEMPLATE.get_in(toml),
+        macros = strify_table(KEY_MACROS.get_in(toml) or {})
     )
+
+# A page whose content file starts with a front matter block is its own manifest
+def from_front_matter(toml: TomlTable, path: Path, dir: Path) -> PageManifest:
+    return PageManifest(
+        dir = dir,
+        path = path,
+        file = path.relative_to(dir).as_posix(),
+        template = KEY_TEMPLATE.get_in(toml),
+        front_matter = True,
+        macros = strify_table(KEY_MACROS.get_in(toml) or {})
+    )
+
+def split_front_matter(text: str) -> Tuple[Optional[str], str]:
+    if not text.startswith(FRONT_MATTER_DELIMITER):
+        return None, text
+
+    lines = text.splitlines(keepends = True)
+    if lines[0].strip() != FRONT_MATTER_DELIMITER:
+        return None, text
+
+    for i in range(1, len(lines)):
+        if lines[i].strip() == FRONT_MATTER_DELIMITER:
+            return "".join(lines[1:i]), "".join(lines[i + 1:])
+
+    raise Exception(f"Front matter is not closed with {FRONT_MATTER_DELIMITER}")
+
+def is_markdown(manifest: PageManifest) -> bool:
+    return Path(manifest.file).suffix.lower() in MARKDOWN_EXTENSIONS
+
+# Markdown pages are written out as HTML
+def output_path(manifest: PageManifest) -> Path:
+    rpath = Path(manifest.file) if manifest.front_matter else manifest.path.parent.relative_to(manifest.dir) / manifest.file
+    return rpath.with_suffix(".html") if is_markdown(manifest) else rpath
@@ -1,9 +1,9 @@
 from dataclasses import dataclass
 from pathlib import Path
 import tomllib
-from typing import Final, List, Optional
+from typing import Dict, Final, List, Optional
 
-from wobsite_proc.toml_utils import RequiredTomlArray, RequiredTomlTable, strify
+from wobsite_proc.toml_utils import OptionalTomlArray, OptionalTomlInt, OptionalTomlTable, RequiredTomlArray, RequiredTomlTable, strify, strify_table
 
 FILE_NAME: Final[str] = "wobsite.toml"
 
@@ -12,12 +12,24 @@ KEY_SITE_TABLE: Final[RequiredTomlTable] = RequiredTomlTable("site")
 KEY_TEMPLATES: Final[RequiredTomlArray] = RequiredTomlArray("templates", KEY_SITE_TABLE)
 KEY_PAGES: Final[RequiredTomlArray] = RequiredTomlArray("pages", KEY_SITE_TABLE)
 KEY_ASSETS: Final[RequiredTomlArray] = RequiredTomlArray("assets", KEY_SITE_TABLE)
+KEY_IGNORE: Final[OptionalTomlArray] = OptionalTomlArray("ignore", KEY_SITE_TABLE)
+
+KEY_MACROS: Final[OptionalTomlTable] = OptionalTomlTable("macros")
+
+KEY_IO_THREADS: Final[OptionalTomlInt] = OptionalTomlInt("io_threads", "build")
+KEY_IO_WINDOW: Final[OptionalTomlInt] = OptionalTomlInt("io_window", "build")
+KEY_MEMORY_BUDGET: Final[OptionalTomlInt] = OptionalTomlInt("memory_budget", "build")
 
 @dataclass
 class SiteManifest:
     templates: List[str]
     pages: List[str]
     assets: List[str]
+    ignore: List[str]
+    io_threads: Optional[int]
+    io_window: Optional[int]
+    memory_budget: Optional[int]
+    macros: Dict[str, str]
 
 def parse_file(path: Path) -> SiteManifest:
     with path.open("rb") as file:
@@ -26,7 +38,12 @@ def parse_file(path: Path) -> SiteManifest:
     return SiteManifest(
         templates = strify(KEY_TEMPLATES.get_in(toml)),
         pages = strify(KEY_PAGES.get_in(toml)),
-        assets = strify(KEY_ASSETS.get_in(toml))
+        assets = strify(KEY_ASSETS.get_in(toml)),
+        ignore = strify(KEY_IGNORE.get_in(toml) or []),
+        io_threads = KEY_IO_THREADS.get_in(toml),
+        io_window = KEY_IO_WINDOW.get_in(toml),
+        memory_budget = KEY_MEMORY_BUDGET.get_in(toml),
+        macros = strify_table(KEY_MACROS.get_in(toml) or {})
     )
 
 def get_in(path: Path) -> Optional[SiteManifest]:
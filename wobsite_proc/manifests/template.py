@@ -1,29 +1,36 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from pathlib import Path
 import tomllib
-from typing import Final
+from typing import Dict, Final
 
-from wobsite_proc.toml_utils import RequiredTomlString, RequiredTomlTable
+from wobsite_proc.toml_utils import OptionalTomlTable, RequiredTomlString, RequiredTomlTable, TomlTable, strify_table
 
 KEY_TEMPLATE_TABLE: Final[RequiredTomlTable] = RequiredTomlTable("template")
 
 KEY_FILE: Final[RequiredTomlString] = RequiredTomlString("file", KEY_TEMPLATE_TABLE)
 KEY_NAME: Final[RequiredTomlString] = RequiredTomlString("name", KEY_TEMPLATE_TABLE)
 
-@dataclass
+KEY_MACROS: Final[OptionalTomlTable] = OptionalTomlTable("macros")
+
+@dataclass(slots = True)
 class TemplateManifest:
     dir: Path
     path: Path
     name: str
     file: str
+    macros: Dict[str, str] = field(default_factory = lambda: {})
 
 def parse_file(path: Path, dir: Path) -> TemplateManifest:
     with path.open("rb") as file:
         toml = tomllib.load(file)
 
+    return from_toml(toml, path, dir)
+
+def from_toml(toml: TomlTable, path: Path, dir: Path) -> TemplateManifest:
     return TemplateManifest(
         dir = dir,
         path = path,
         name = KEY_NAME.get_in(toml),
-        file = KEY_FILE.get_in(toml)
+        file = KEY_FILE.get_in(toml),
+        macros = strify_table(KEY_MACROS.get_in(toml) or {})
     )
@@ -0,0 +1,183 @@
+from collections import OrderedDict
+from copy import deepcopy
+import hashlib
+from typing import Any, Dict, Final, List, Optional, cast
+
+from lxml import html
+from lxml.html import HtmlElement
+from markdown_it import MarkdownIt
+from markdown_it.common.utils import unescapeAll
+from markdown_it.renderer import RendererHTML
+from markdown_it.token import Token
+
+CACHE_SIZE: Final[int] = 1024
+
+class MarkdownRenderer:
+    md: MarkdownIt
+    hits: int
+    misses: int
+    cache_size: int
+    __cache: OrderedDict[bytes, HtmlElement]
+
+    def __init__(self) -> None:
+        self.md = MarkdownIt('commonmark', {"breaks": True})
+        self.hits = 0
+        self.misses = 0
+        self.cache_size = CACHE_SIZE
+        self.__cache = OrderedDict()
+
+    def render(self, source: str, parent: str) -> HtmlElement:
+        key = hashlib.sha256(f"{parent}\0{source}".encode()).digest()
+        cached = self.__cache.get(key)
+
+        if cached is not None:
+            self.hits += 1
+            self.__cache.move_to_end(key)
+            return deepcopy(cached)
+
+        self.misses += 1
+        fragment = self.__render(source, parent)
+
+        if self.cache_size <= 0:
+            return fragment
+
+        self.__cache[key] = fragment
+        if len(self.__cache) > self.cache_size:
+            self.__cache.popitem(last = False)
+
+        return deepcopy(fragment)
+
+    def clear(self) -> None:
+        self.__cache.clear()
+
+    def __render(self, source: str, parent: str) -> HtmlElement:
+        env: Dict[str, Any] = {}
+        tokens = self.md.parse(source, env)
+
+        # Raw HTML may open an element in one block and close it in another, so only
+        # the HTML parser can place it correctly
+        if any(t.type == "html_block" or (t.children and any(c.type == "html_inline" for c in t.children)) for t in tokens):
+            return html.fragment_fromstring(
+                self.md.renderer.render(tokens, self.md.options, env),
+                create_parent = parent # type: ignore
+            )
+
+        builder = TreeBuilder(html.Element(parent))
+        builder.block(tokens, self.md, env)
+        return builder.root
+
+# Builds the same tree that parsing MarkdownIt's HTML output would, straight from the token stream
+class TreeBuilder:
+    root: HtmlElement
+    stack: List[HtmlElement]
+
+    def __init__(self, root: HtmlElement) -> None:
+        self.root = root
+        self.stack = [root]
+
+    def block(self, tokens: List[Token], md: MarkdownIt, env: Dict[str, Any]) -> None:
+        for i, t in enumerate(tokens):
+            if t.type == "inline":
+                self.inline(t.children or [], md, env)
+                continue
+
+            if t.hidden:
+                continue
+
+            # Code blocks have their own renderer, which does not separate them from a preceding tight paragraph
+            if t.type == "code_block" or t.type == "fence":
+                self.code(t, md)
+                continue
+
+            if t.nesting != -1 and i > 0 and tokens[i - 1].hidden:
+                self.text("\n")
+
+            if t.nesting == 1:
+                self.open(t)
+
+                next = tokens[i + 1] if i + 1 < len(tokens) else None
+                if next is not None and next.type != "inline" and not next.hidden and not (next.nesting == -1 and next.tag == t.tag):
+                    self.text("\n")
+            elif t.nesting == -1:
+                self.close()
+                self.text("\n")
+            else:
+                self.open(t)
+                self.close()
+                self.text("\n")
+
+    def inline(self, tokens: List[Token], md: MarkdownIt, env: Dict[str, Any]) -> None:
+        for t in tokens:
+            if t.type == "text":
+                self.text(t.content)
+            elif t.type == "softbreak":
+                if md.options["breaks"]:
+                    self.open(t, "br")
+                    self.close()
+                self.text("\n")
+            elif t.type == "hardbreak":
+                self.open(t, "br")
+                self.close()
+                self.text("\n")
+            elif t.type == "code_inline":
+                self.open(t)
+                self.text(t.content)
+                self.close()
+            elif t.type == "image":
+                e = self.open(t)
+                # MarkdownIt renders with RendererHTML unless given another renderer class
+                renderer = cast(RendererHTML, md.renderer)
+                e.set("alt", renderer.renderInlineAsText(t.children or [], md.options, env))
+                self.close()
+            elif t.nesting == 1:
+                self.open(t)
+            elif t.nesting == -1:
+                self.close()
+            else:
+                self.open(t)
+                self.close()
+
+    def code(self, t: Token, md: MarkdownIt) -> None:
+        pre = html.Element("pre")
+        code = html.Element("code")
+        pre.append(code)
+        self.stack[-1].append(pre)
+
+        info = unescapeAll(t.info).strip() if t.type == "fence" else ""
+        if info:
+            code.set("class", md.options["langPrefix"] + info.split(maxsplit = 1)[0])
+
+        code.text = t.content
+        self.text("\n")
+
+    def open(self, t: Token, tag: Optional[str] = None) -> HtmlElement:
+        e = html.Element(tag or t.tag)
+
+        for k, v in t.attrs.items():
+            e.set(k, str(v))
+
+        self.stack[-1].append(e)
+        self.stack.append(e)
+        return e
+
+    def close(self) -> None:
+        self.stack.pop()
+
+    def text(self, text: str) -> None:
+        parent = self.stack[-1]
+
+        if len(parent):
+            last = parent[-1]
+            last.tail = (last.tail or "") + text
+        else:
+            parent.text = (parent.text or "") + text
+
+__shared: Optional[MarkdownRenderer] = None
+
+def shared_renderer() -> MarkdownRenderer:
+    global __shared
+
+    if __shared is None:
+        __shared = MarkdownRenderer()
+
+    return __shared
@@ -0,0 +1,64 @@
+import gc
+import os
+import sys
+from typing import Callable, Final, Optional
+
+# Pages compiled between two checks of the resident set size against the budget
+CHECK_INTERVAL: Final[int] = 64
+# Pages read ahead and outputs held for writing when a memory budget is set
+LOW_MEMORY_WINDOW: Final[int] = 4
+
+# Resident set size of this process in bytes, None where it cannot be read cheaply
+def current_rss() -> Optional[int]:
+    try:
+        with open("/proc/self/statm", "rb") as file:
+            return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+# Highest resident set size of this process or any of its finished workers, in bytes, 0 where it cannot be read
+def peak_rss() -> int:
+    try:
+        import resource
+    except ImportError:
+        return 0
+
+    peak = max(
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    )
+
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+class MemoryBudget:
+    limit: int
+    exceeded: bool
+    __pages: int
+
+    def __init__(self, limit: int) -> None:
+        self.limit = limit
+        self.exceeded = False
+        self.__pages = 0
+
+    # Called once per page; every CHECK_INTERVAL pages releases the caches when the process is over budget.
+    # Returns the resident set size if it is still over budget after releasing, the first time that happens.
+    def check(self, release: Callable[[], None]) -> Optional[int]:
+        self.__pages += 1
+
+        if self.__pages % CHECK_INTERVAL != 0:
+            return None
+
+        rss = current_rss()
+        if rss is None or rss <= self.limit:
+            return None
+
+        release()
+        gc.collect()
+
+        rss = current_rss()
+        if rss is None or rss <= self.limit or self.exceeded:
+            return None
+
+        self.exceeded = True
+        return rss
@@ -0,0 +1,87 @@
+import re
+from typing import Final, List, Optional, Set, Tuple
+
+from lxml import etree
+from lxml.html import HtmlElement
+
+# Whitespace inside these is significant or not HTML, so their contents are left untouched
+PRESERVE_ELEMENTS: Final[Set[str]] = { "pre", "textarea", "script", "style" }
+
+# Elements that start and end a line box, so whitespace next to them is never rendered
+BLOCK_ELEMENTS: Final[Set[str]] = {
+    "html", "head", "body", "title", "meta", "link", "base",
+    "address", "article", "aside", "blockquote", "details", "dialog", "dd", "div", "dl", "dt",
+    "fieldset", "figcaption", "figure", "footer", "form", "h1", "h2", "h3", "h4", "h5", "h6",
+    "header", "hgroup", "hr", "li", "main", "nav", "ol", "p", "pre", "section", "summary", "ul",
+    "table", "caption", "colgroup", "col", "thead", "tbody", "tfoot", "tr", "td", "th"
+}
+
+# HTML whitespace; unlike \s this leaves non-breaking spaces alone
+WHITESPACE: Final[re.Pattern[str]] = re.compile(r"[ \t\n\f\r]+")
+
+# Drops comments and collapses insignificant whitespace in place. Returns the number of bytes removed.
+def minify_tree(root: HtmlElement) -> int:
+    saved = 0
+
+    comments: List[HtmlElement] = [
+        c for c in root.iter(etree.Comment) if not (c.text or "").startswith("[if")
+    ]
+
+    for c in comments:
+        saved += len(etree.tostring(c, encoding = "utf-8", with_tail = False))
+        __remove_keeping_tail(c)
+
+    return saved + __minify(root)
+
+def __minify(e: HtmlElement) -> int:
+    if e.tag in PRESERVE_ELEMENTS:
+        return 0
+
+    saved = 0
+    children = list(e)
+
+    text, removed = __collapse(e.text, __is_block(e), __is_block(children[0]) if children else __is_block(e))
+    e.text = text
+    saved += removed
+
+    for i, c in enumerate(children):
+        saved += __minify(c)
+
+        right = __is_block(children[i + 1]) if i + 1 < len(children) else __is_block(e)
+        tail, removed = __collapse(c.tail, __is_block(c), right)
+        c.tail = tail
+        saved += removed
+
+    return saved
+
+def __collapse(text: Optional[str], block_before: bool, block_after: bool) -> Tuple[Optional[str], int]:
+    if not text:
+        return text, 0
+
+    collapsed = WHITESPACE.sub(" ", text)
+
+    if block_before:
+        collapsed = collapsed.lstrip(" ")
+    if block_after:
+        collapsed = collapsed.rstrip(" ")
+
+    return (collapsed or None), len(text) - len(collapsed)
+
+def __is_block(e: HtmlElement) -> bool:
+    return e.tag in BLOCK_ELEMENTS
+
+def __remove_keeping_tail(e: HtmlElement) -> None:
+    parent = e.getparent()
+
+    if parent is None:
+        return
+
+    if e.tail:
+        previous = e.getprevious()
+
+        if previous is not None:
+            previous.tail = (previous.tail or "") + e.tail
+        else:
+            parent.text = (parent.text or "") + e.tail
+
+    parent.remove(e)
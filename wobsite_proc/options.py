@@ -0,0 +1,33 @@
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+from wobsite_proc import compress
+from wobsite_proc.assets import AssetLinkMode
+from wobsite_proc.shard import Shard
+
+@dataclass
+class BuildOptions:
+    incremental: bool = False
+    jobs: int = 1
+    asset_link: AssetLinkMode = "copy"
+    asset_checksum: bool = False
+    asset_hash: bool = False
+    cache_dir: Optional[Path] = None
+    minify: bool = False
+    gzip: bool = False
+    gzip_min_size: int = compress.DEFAULT_MIN_SIZE
+    gzip_level: int = compress.DEFAULT_LEVEL
+    plan: bool = False
+    profile: bool = False
+    profile_top: int = 10
+    profile_json: Optional[Path] = None
+    profile_trace: Optional[Path] = None
+    # None falls back to the [build] table of wobsite.toml, then to the file_io defaults
+    io_threads: Optional[int] = None
+    io_window: Optional[int] = None
+    # In MiB; None falls back to the [build] table of wobsite.toml, then to no limit
+    memory_budget: Optional[int] = None
+    trace_memory: bool = False
+    # Compile only this shard's part of the pages and assets, into its own output directory
+    shard: Optional[Shard] = None
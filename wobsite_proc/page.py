@@ -1,10 +1,14 @@
 from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
 
 from lxml import html, etree
 from lxml.html import HtmlElement
-from markdown_it import MarkdownIt
 
-from wobsite_proc.manifests.page import PageManifest
+from wobsite_proc import markdown
+from wobsite_proc.manifests import page as page_manifest
+from wobsite_proc.manifests.page import PageManifest, is_markdown
+from wobsite_proc.template import PAGE_CONTENT_ELEMENT
 
 @dataclass
 class ParsedPage:
@@ -14,31 +18,42 @@ class ParsedPage:
     def to_string(self) -> str:
         return etree.tostring(self.content, encoding="unicode", method="html")
 
-def parse_html(manifest: PageManifest) -> ParsedPage:
-    path = (manifest.dir / manifest.file)
+    def to_bytes(self) -> bytes:
+        return etree.tostring(self.content, encoding="utf-8", method="html")
 
-    with path.open("rt") as file:
-        fragment = html.fragment_fromstring(
-            file.read(),
-            create_parent = "wobsite-page-content" # type: ignore
-        )
+    def write(self, path: Path) -> None:
+        with etree.htmlfile(str(path), encoding="utf-8") as file:
+            file.write(self.content)
+
+def parse_html(manifest: PageManifest, data: Optional[bytes] = None) -> ParsedPage:
+    fragment = html.fragment_fromstring(
+        __source(manifest, data),
+        create_parent = PAGE_CONTENT_ELEMENT # type: ignore
+    )
 
     return ParsedPage(
         manifest = manifest,
         content = fragment
     )
 
-def parse_md(manifest: PageManifest) -> ParsedPage:
-    md = MarkdownIt('commonmark', {"breaks": True})
-    path = (manifest.dir / manifest.file)
-    
-    with path.open("rt") as file:
-        fragment = html.fragment_fromstring(
-            md.render(file.read()),
-            create_parent=custom_elements.PAGE_CONTENT_ELEMENT # type: ignore
-        )
+def parse_md(manifest: PageManifest, data: Optional[bytes] = None) -> ParsedPage:
+    fragment = markdown.shared_renderer().render(__source(manifest, data), PAGE_CONTENT_ELEMENT)
 
     return ParsedPage(
         manifest = manifest,
         content = fragment
     )
+
+def parse(manifest: PageManifest, data: Optional[bytes] = None) -> ParsedPage:
+    return parse_md(manifest, data) if is_markdown(manifest) else parse_html(manifest, data)
+
+def __source(manifest: PageManifest, data: Optional[bytes]) -> str:
+    if data is None:
+        data = (manifest.dir / manifest.file).read_bytes()
+
+    text = data.decode()
+
+    if manifest.front_matter:
+        _, text = page_manifest.split_front_matter(text)
+
+    return text
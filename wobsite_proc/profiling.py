@@ -0,0 +1,141 @@
+from contextlib import AbstractContextManager, nullcontext
+from dataclasses import asdict, dataclass
+import json
+import os
+from pathlib import Path
+import threading
+import time
+from typing import Dict, Final, List, Optional, Tuple
+
+from wobsite_proc.log import Log
+
+DISABLED: Final[AbstractContextManager[None]] = nullcontext()
+
+@dataclass
+class ProfileEvent:
+    phase: str
+    page: Optional[str]
+    start: int
+    wall: int
+    cpu: int
+    pid: int
+    tid: int
+
+class ProfileSpan(AbstractContextManager[None]):
+    profiler: "Profiler"
+    phase: str
+    page: Optional[str]
+    start: int
+    start_cpu: int
+
+    def __init__(self, profiler: "Profiler", phase: str, page: Optional[str]) -> None:
+        self.profiler = profiler
+        self.phase = phase
+        self.page = page
+
+    def __enter__(self) -> None:
+        # Build phases do not nest, so each one can own the traced peak
+        if self.profiler.trace_memory and self.page is None:
+            import tracemalloc
+            tracemalloc.reset_peak()
+
+        self.start = time.perf_counter_ns()
+        self.start_cpu = time.thread_time_ns()
+
+    def __exit__(self, *_: object) -> None:
+        self.profiler.add(ProfileEvent(
+            phase = self.phase,
+            page = self.page,
+            start = self.start,
+            wall = time.perf_counter_ns() - self.start,
+            cpu = time.thread_time_ns() - self.start_cpu,
+            pid = os.getpid(),
+            tid = threading.get_ident()
+        ))
+
+        if self.profiler.trace_memory and self.page is None:
+            import tracemalloc
+            peak = tracemalloc.get_traced_memory()[1]
+            self.profiler.memory_peaks[self.phase] = max(peak, self.profiler.memory_peaks.get(self.phase, 0))
+
+class Profiler:
+    enabled: bool
+    trace_memory: bool
+    events: List[ProfileEvent]
+    # Highest tracemalloc peak of each build phase, in bytes
+    memory_peaks: Dict[str, int]
+    # Writer threads record their spans while the compile thread drains
+    __lock: threading.Lock
+
+    def __init__(self, enabled: bool, trace_memory: bool = False) -> None:
+        self.enabled = enabled or trace_memory
+        self.trace_memory = trace_memory
+        self.events = []
+        self.memory_peaks = {}
+        self.__lock = threading.Lock()
+
+    def phase(self, name: str, page: Optional[str] = None) -> AbstractContextManager[None]:
+        if not self.enabled:
+            return DISABLED
+
+        return ProfileSpan(self, name, page)
+
+    def add(self, event: ProfileEvent) -> None:
+        with self.__lock:
+            self.events.append(event)
+
+    def drain(self) -> List[ProfileEvent]:
+        with self.__lock:
+            events = self.events
+            self.events = []
+
+        return events
+
+    def report(self, top: int, log: Log) -> None:
+        phases: Dict[str, Tuple[int, int, int]] = {}
+        pages: Dict[str, int] = {}
+
+        for e in self.events:
+            count, wall, cpu = phases.get(e.phase, (0, 0, 0))
+            phases[e.phase] = (count + 1, wall + e.wall, cpu + e.cpu)
+
+            if e.page is not None:
+                pages[e.page] = pages.get(e.page, 0) + e.wall
+
+        log.info("Profile:")
+        log.indent()
+        log.info(f"{'phase':<16} {'count':>8} {'wall ms':>10} {'cpu ms':>10}")
+        for phase, (count, wall, cpu) in sorted(phases.items(), key = lambda i: -i[1][1]):
+            log.info(f"{phase:<16} {count:>8} {wall / 1e6:>10.2f} {cpu / 1e6:>10.2f}")
+
+        if pages:
+            log.info(f"Slowest {min(top, len(pages))} page(s):")
+            log.indent()
+            for page, wall in sorted(pages.items(), key = lambda i: -i[1])[:top]:
+                log.info(f"{wall / 1e6:>10.2f} ms {page}")
+            log.outdent()
+        log.outdent()
+
+    def write_json(self, path: Path) -> None:
+        with path.open("wt") as file:
+            json.dump([asdict(e) for e in self.events], file)
+
+    def write_trace(self, path: Path) -> None:
+        origin = min((e.start for e in self.events), default = 0)
+
+        with path.open("wt") as file:
+            json.dump({
+                "traceEvents": [
+                    {
+                        "name": e.phase,
+                        "cat": "page" if e.page is not None else "build",
+                        "ph": "X",
+                        "ts": (e.start - origin) / 1000,
+                        "dur": e.wall / 1000,
+                        "pid": e.pid,
+                        "tid": e.tid,
+                        "args": { "page": e.page, "cpu_us": e.cpu / 1000 } if e.page is not None else { "cpu_us": e.cpu / 1000 }
+                    } for e in self.events
+                ],
+                "displayTimeUnit": "ms"
+            }, file)
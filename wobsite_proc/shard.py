@@ -0,0 +1,128 @@
+from dataclasses import dataclass
+import filecmp
+import hashlib
+from pathlib import Path
+import re
+from typing import Dict, Final, List, Optional, Set
+
+from wobsite_proc.assets import AssetLinkMode, remove_stale_files, sync_file
+from wobsite_proc.fs import walk_files
+from wobsite_proc.log import Log
+from wobsite_proc.summary import BuildSummary
+
+# Shard output directories are named after the site output directory, as <output>-shard-<i>-of-<n>
+DIR_PATTERN: Final[re.Pattern[str]] = re.compile(r"-shard-([0-9]+)-of-([0-9]+)")
+
+@dataclass(frozen = True)
+class Shard:
+    # 1-based
+    index: int
+    count: int
+
+    @property
+    def name(self) -> str:
+        return f"shard-{self.index}-of-{self.count}"
+
+    # Pages and assets are assigned by a hash of their relative path, so every machine agrees on the partition
+    def contains(self, key: str) -> bool:
+        digest = hashlib.sha256(key.encode()).digest()
+        return int.from_bytes(digest[:8]) % self.count == self.index - 1
+
+def parse(text: str) -> Shard:
+    index, _, count = text.partition("/")
+
+    try:
+        shard = Shard(int(index), int(count))
+    except ValueError:
+        raise ValueError(f"Shard {text} is not of the form i/N")
+
+    if not 1 <= shard.index <= shard.count:
+        raise ValueError(f"Shard {text} is out of range, i must be between 1 and N")
+
+    return shard
+
+def output_dir(output_dir: Path, shard: Shard) -> Path:
+    return output_dir.with_name(f"{output_dir.name}-{shard.name}")
+
+def find_shard_dirs(output_dir: Path) -> List[Path]:
+    pattern = re.compile(re.escape(output_dir.name) + DIR_PATTERN.pattern)
+
+    return sorted(
+        p for p in output_dir.parent.iterdir() if p.is_dir() and pattern.fullmatch(p.name)
+    )
+
+# Combines the outputs of every shard into output_dir. Fails without writing anything if the shards are not all
+# of the same, complete set, or if two shards wrote different contents to the same path.
+def merge(shard_dirs: List[Path], output_dir: Path, link: AssetLinkMode, summary: BuildSummary, log: Log) -> bool:
+    if not shard_dirs:
+        log.err(f"No shard outputs found next to {output_dir}")
+        return False
+
+    if not __check_complete(shard_dirs, log):
+        return False
+
+    sources: Dict[str, Path] = {}
+    collisions = 0
+
+    for d in shard_dirs:
+        for f, _ in walk_files(d):
+            rel = f.relative_to(d).as_posix()
+            previous = sources.get(rel)
+
+            if previous is None:
+                sources[rel] = f
+                continue
+
+            # Every shard writes site-wide files such as the asset manifest, which must then agree
+            if not filecmp.cmp(previous, f, shallow = False):
+                log.err(f"{f} collides with {previous}")
+                collisions += 1
+
+    if collisions:
+        log.err(f"Found {collisions} colliding output(s), nothing was merged")
+        return False
+
+    live: Set[Path] = set()
+
+    for rel, f in sorted(sources.items()):
+        target = output_dir / rel
+        sync_file(f, f.stat(), target, link, False, summary, log)
+        live.add(target)
+
+    remove_stale_files(output_dir, live, summary, log)
+    return True
+
+def __check_complete(shard_dirs: List[Path], log: Log) -> bool:
+    shards: Set[Shard] = set()
+
+    for d in shard_dirs:
+        shard = __shard_of(d)
+
+        if shard is None:
+            log.err(f"{d} is not a shard output directory")
+            return False
+
+        shards.add(shard)
+
+    counts = { s.count for s in shards }
+
+    if len(counts) != 1:
+        log.err(f"Shard outputs come from different shard counts: {', '.join(str(c) for c in sorted(counts))}")
+        return False
+
+    count = counts.pop()
+    missing = [i for i in range(1, count + 1) if Shard(i, count) not in shards]
+
+    if missing:
+        log.err(f"Missing output of shard(s) {', '.join(f'{i}/{count}' for i in missing)}")
+        return False
+
+    return True
+
+def __shard_of(dir: Path) -> Optional[Shard]:
+    match = DIR_PATTERN.search(dir.name)
+
+    if match is None:
+        return None
+
+    return Shard(int(match.group(1)), int(match.group(2)))
@@ -0,0 +1,65 @@
+from dataclasses import dataclass, field
+from typing import Dict
+
+from wobsite_proc.log import Log
+
+@dataclass
+class BuildSummary:
+    dirs_scanned: int = 0
+    dirs_reused: int = 0
+    manifests_parsed: int = 0
+    manifests_reused: int = 0
+    pages_compiled: int = 0
+    pages_skipped: int = 0
+    template_cache_hits: int = 0
+    template_cache_misses: int = 0
+    assets_copied: int = 0
+    assets_skipped: int = 0
+    asset_bytes_copied: int = 0
+    asset_bytes_skipped: int = 0
+    stale_files_removed: int = 0
+    minified_bytes: int = 0
+    gzip_compressed: int = 0
+    gzip_skipped: int = 0
+    gzip_bytes_in: int = 0
+    gzip_bytes_out: int = 0
+    estimated_ns: int = 0
+    pages_unestimated: int = 0
+    peak_rss: int = 0
+    memory_peaks: Dict[str, int] = field(default_factory = lambda: {})
+
+    def report(self, log: Log) -> None:
+        log.info(f"Discovery: rescanned {self.dirs_scanned} of {self.dirs_scanned + self.dirs_reused} directory(ies), parsed {self.manifests_parsed} of {self.manifests_parsed + self.manifests_reused} manifest(s)")
+        log.info(f"Compiled {self.pages_compiled} page(s), skipped {self.pages_skipped} unchanged page(s)")
+        log.info(f"Template cache: {self.template_cache_hits} hit(s), {self.template_cache_misses} miss(es)")
+        log.info(f"Assets: copied {self.assets_copied} file(s) ({self.asset_bytes_copied} bytes), skipped {self.assets_skipped} unchanged file(s) ({self.asset_bytes_skipped} bytes)")
+        log.info(f"Removed {self.stale_files_removed} stale output file(s)")
+
+        if self.minified_bytes:
+            log.info(f"Minification: saved {self.minified_bytes} bytes across compiled pages")
+
+        if self.gzip_compressed or self.gzip_skipped:
+            log.info(f"Gzip: compressed {self.gzip_compressed} file(s) ({self.gzip_bytes_in} to {self.gzip_bytes_out} bytes), skipped {self.gzip_skipped} unchanged file(s)")
+
+        if self.peak_rss:
+            log.info(f"Peak RSS: {self.peak_rss / 2**20:.1f} MiB")
+
+        if self.memory_peaks:
+            log.info("Traced memory peak per phase (this process):")
+            log.indent()
+            for phase, peak in sorted(self.memory_peaks.items(), key = lambda i: -i[1]):
+                log.info(f"{phase:<16} {peak / 2**20:>10.1f} MiB")
+            log.outdent()
+
+    def report_plan(self, jobs: int, log: Log) -> None:
+        log.info(f"Plan: compile {self.pages_compiled} page(s), skip {self.pages_skipped} unchanged page(s)")
+        log.info(f"Plan: copy {self.assets_copied} asset(s) ({self.asset_bytes_copied} bytes), skip {self.assets_skipped} unchanged asset(s)")
+        log.info(f"Plan: remove {self.stale_files_removed} stale output file(s)")
+
+        workers = max(1, min(jobs, self.pages_compiled))
+        estimate = f"Plan: estimated page compile time {self.estimated_ns / workers / 1e6:.1f} ms on {workers} job(s)"
+
+        if self.pages_unestimated:
+            estimate += f", not counting {self.pages_unestimated} page(s) without a recorded cost"
+
+        log.info(estimate)
@@ -1,24 +1,33 @@
-from dataclasses import dataclass
-from typing import Final
+from copy import deepcopy
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Final, List, Optional, Set, Tuple
 
 from lxml import etree, html
 from lxml.html import HtmlElement
 
+from wobsite_proc.asset_hash import AssetMap, rewrite_references
 from wobsite_proc.log import Log;
+from wobsite_proc.macro import MACRO_PLACEHOLDER_ELEMENT, key_of
 from wobsite_proc.manifests.template import TemplateManifest
+from wobsite_proc.minify import minify_tree
 
 PAGE_CONTENT_ELEMENT: Final[str] = "wobsite-page-content"
+SKELETON_SLOT_ELEMENT: Final[str] = "wobsite-skeleton-slot"
+MACRO_SLOT_PREFIX: Final[str] = "macro:"
 
 @dataclass
 class ParsedTemplate:
     manifest: TemplateManifest
     document: HtmlElement
+    # Bytes removed by minification, None if the template was not minified
+    minified: Optional[int] = None
 
     def substitute_content(self, page_content: HtmlElement, log: Log) -> None:
         placeholder = self.document.find(f".//{PAGE_CONTENT_ELEMENT}")
 
         if placeholder is None:
-            log.warn(f"Template {self.manifest.name} does not contain wobsite-page-content element")
+            warn_missing_content(self.manifest, log)
             return
 
         parent = placeholder.getparent()
@@ -31,6 +40,185 @@ class ParsedTemplate:
     def to_string(self) -> str:
         return etree.tostring(self.document, encoding="unicode", method="html")
 
+    def to_bytes(self) -> bytes:
+        return etree.tostring(self.document, encoding="utf-8", method="html")
+
+    def write(self, path: Path) -> None:
+        with etree.htmlfile(str(path), encoding="utf-8") as file:
+            file.write(self.document)
+
+    def copy(self) -> "ParsedTemplate":
+        return ParsedTemplate(self.manifest, deepcopy(self.document), self.minified)
+
+# A template serialized once into byte segments around its slots, so a page is rendered by concatenation
+@dataclass
+class TemplateSkeleton:
+    manifest: TemplateManifest
+    segments: List[bytes]
+    slots: List[str]
+    minified: Optional[int] = None
+    # Keys of the macros used by the template, each once
+    macros: List[str] = field(default_factory = lambda: [])
+
+    def has_slot(self, name: str) -> bool:
+        return name in self.slots
+
+    def render(self, values: Dict[str, bytes]) -> bytes:
+        parts: List[bytes] = []
+
+        for segment, slot in zip(self.segments, self.slots):
+            parts.append(segment)
+            parts.append(values[slot])
+
+        parts.append(self.segments[-1])
+        return b"".join(parts)
+
+    def write(self, path: Path, values: Dict[str, bytes]) -> None:
+        with path.open("wb") as file:
+            for segment, slot in zip(self.segments, self.slots):
+                file.write(segment)
+                file.write(values[slot])
+
+            file.write(self.segments[-1])
+
+def compile_skeleton(template: ParsedTemplate) -> Optional[TemplateSkeleton]:
+    document = deepcopy(template.document)
+    placeholder = document.find(f".//{PAGE_CONTENT_ELEMENT}")
+
+    if placeholder is not None and placeholder.getparent() is None:
+        return TemplateSkeleton(template.manifest, [b"", b""], [PAGE_CONTENT_ELEMENT], template.minified)
+
+    # Every slot is marked with a numbered element in document order, so the serialized output is split once per slot
+    slots: List[str] = []
+    markers: List[HtmlElement] = []
+
+    for e in list(document.iter(PAGE_CONTENT_ELEMENT, MACRO_PLACEHOLDER_ELEMENT)):
+        parent = e.getparent()
+        if parent is None:
+            continue
+
+        marker = html.Element(SKELETON_SLOT_ELEMENT, n = str(len(markers)))
+
+        # Substitute the way ParsedTemplate.substitute_content and macro.expand do
+        if e.tag == PAGE_CONTENT_ELEMENT:
+            if e is not placeholder:
+                continue
+            slots.append(PAGE_CONTENT_ELEMENT)
+        else:
+            slots.append(macro_slot(key_of(e)))
+            marker.tail = e.tail
+
+        parent.replace(e, marker)
+        markers.append(marker)
+
+    rest = etree.tostring(document, encoding="utf-8", method="html")
+    segments: List[bytes] = []
+
+    for marker in markers:
+        parts = rest.split(etree.tostring(marker, encoding="utf-8", method="html", with_tail=False))
+
+        if len(parts) != 2:
+            return None
+
+        segments.append(parts[0])
+        rest = parts[1]
+
+    segments.append(rest)
+    macros = [s[len(MACRO_SLOT_PREFIX):] for s in dict.fromkeys(slots) if s.startswith(MACRO_SLOT_PREFIX)]
+
+    return TemplateSkeleton(template.manifest, segments, slots, template.minified, macros)
+
+def macro_slot(key: str) -> str:
+    return MACRO_SLOT_PREFIX + key
+
+def warn_missing_content(manifest: TemplateManifest, log: Log) -> None:
+    log.warn(f"Template {manifest.name} does not contain wobsite-page-content element")
+
+class TemplateCache:
+    hits: int
+    misses: int
+    minify: bool
+    assets: Optional[AssetMap]
+    __parsed: Dict[str, ParsedTemplate]
+    __skeletons: Dict[Tuple[str, str], Optional[TemplateSkeleton]]
+
+    def __init__(self) -> None:
+        self.hits = 0
+        self.misses = 0
+        self.minify = False
+        self.assets = None
+        self.__parsed = {}
+        self.__skeletons = {}
+
+    # Asset references are relative to the page a template is rendered into, so with hashed assets a template
+    # is prepared once per output directory (base)
+    def use_assets(self, assets: Optional[AssetMap]) -> None:
+        if (assets.digest if assets is not None else None) != (self.assets.digest if self.assets is not None else None):
+            self.__skeletons.clear()
+
+        self.assets = assets
+
+    def get(self, manifest: TemplateManifest, base: str = "") -> ParsedTemplate:
+        parsed = self.__get(manifest).copy()
+
+        if self.assets is not None:
+            rewrite_references(parsed.document, base, self.assets)
+
+        return parsed
+
+    # Returns None when the template cannot be rendered by concatenation and needs the DOM path
+    def skeleton(self, manifest: TemplateManifest, base: str = "") -> Optional[TemplateSkeleton]:
+        parsed = self.__get(manifest)
+        key = (manifest.name, base if self.assets is not None else "")
+
+        if key not in self.__skeletons:
+            if self.assets is not None:
+                parsed = parsed.copy()
+                rewrite_references(parsed.document, base, self.assets)
+
+            self.__skeletons[key] = compile_skeleton(parsed)
+
+        return self.__skeletons[key]
+
+    def __get(self, manifest: TemplateManifest) -> ParsedTemplate:
+        parsed = self.__parsed.get(manifest.name)
+
+        if parsed is None or parsed.manifest != manifest or (parsed.minified is not None) != self.minify:
+            self.misses += 1
+            parsed = parse_html(manifest)
+
+            if self.minify:
+                # Substitution drops the placeholder's tail, so collapsing it would be counted as saved bytes twice
+                placeholder = parsed.document.find(f".//{PAGE_CONTENT_ELEMENT}")
+                if placeholder is not None:
+                    placeholder.tail = None
+
+                parsed.minified = minify_tree(parsed.document)
+
+            self.__parsed[manifest.name] = parsed
+            self.__drop_skeletons(manifest.name)
+        else:
+            self.hits += 1
+
+        return parsed
+
+    def clear(self) -> None:
+        self.__parsed.clear()
+        self.__skeletons.clear()
+
+    def invalidate(self, paths: Set[Path]) -> None:
+        stale = [
+            k for k, v in self.__parsed.items() if v.manifest.path in paths or (v.manifest.dir / v.manifest.file) in paths
+        ]
+
+        for k in stale:
+            del self.__parsed[k]
+            self.__drop_skeletons(k)
+
+    def __drop_skeletons(self, name: str) -> None:
+        for k in [k for k in self.__skeletons if k[0] == name]:
+            del self.__skeletons[k]
+
 def parse_html(manifest: TemplateManifest) -> ParsedTemplate:
     path = (manifest.dir / manifest.file)
 
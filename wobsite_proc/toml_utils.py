@@ -65,6 +65,21 @@ class OptionalTomlString(OptionalTomlKey[str]):
     def _checktype(self, value: TomlValue) -> bool:
         return isinstance(value, str)
 
+class OptionalTomlInt(OptionalTomlKey[int]):
+    @override
+    def _checktype(self, value: TomlValue) -> bool:
+        return isinstance(value, int) and not isinstance(value, bool)
+
+class OptionalTomlTable(OptionalTomlKey[TomlTable]):
+    @override
+    def _checktype(self, value: TomlValue) -> bool:
+        return isinstance(value, dict)
+
+class OptionalTomlArray(OptionalTomlKey[TomlArray]):
+    @override
+    def _checktype(self, value: TomlValue) -> bool:
+        return isinstance(value, list)
+
 class RequiredTomlKey(Generic[T], OptionalTomlKey[T]):
     @override
     def get_in(self, toml: Dict[str, TomlValue]) -> T:
@@ -123,3 +138,20 @@ def parse_toml_path(text: str) -> tuple[str, list[str]]:
 
 def strify(array: TomlArray) -> List[str]:
     return [str(i) for i in array]
+
+def strify_table(table: TomlTable) -> Dict[str, str]:
+    return { k: str(v) for k, v in table.items() if not isinstance(v, (dict, list)) }
+
+# Values in over take precedence; tables present in both are merged recursively
+def merge_tables(base: TomlTable, over: TomlTable) -> TomlTable:
+    merged = dict(base)
+
+    for k, v in over.items():
+        b = merged.get(k)
+
+        if isinstance(b, dict) and isinstance(v, dict):
+            merged[k] = merge_tables(b, v)
+        else:
+            merged[k] = v
+
+    return merged
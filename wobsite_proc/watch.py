@@ -0,0 +1,96 @@
+from dataclasses import replace
+from pathlib import Path
+import time
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from wobsite_proc import compile_wobsite, discover
+from wobsite_proc.build import BuildSession
+from wobsite_proc.fs import walk_files
+from wobsite_proc.log import Log
+from wobsite_proc.manifests import site as site_manifest
+from wobsite_proc.options import BuildOptions
+
+type Snapshot = Dict[Path, Tuple[int, int]]
+
+def watch_wobsite(path: Path, options: BuildOptions, interval: float = 0.5, debounce: float = 0.2) -> None:
+    log = Log()
+    session = BuildSession()
+
+    __rebuild(path, options, session, log, None)
+    options = replace(options, incremental = True)
+
+    snapshot = take_snapshot(path)
+    log.info(f"Watching {path} for changes")
+
+    while True:
+        time.sleep(interval)
+
+        current = take_snapshot(path)
+        if current == snapshot:
+            continue
+
+        # Wait for the burst of changes to settle before rebuilding
+        while True:
+            time.sleep(debounce)
+            settled = take_snapshot(path)
+
+            if settled == current:
+                break
+
+            current = settled
+
+        changed = {
+            p for p in snapshot.keys() | current.keys() if snapshot.get(p) != current.get(p)
+        }
+        snapshot = current
+
+        session.invalidate(changed)
+        __rebuild(path, options, session, log, changed)
+
+def take_snapshot(path: Path) -> Snapshot:
+    snapshot: Snapshot = {}
+
+    try:
+        manifest = site_manifest.get_in(path)
+    except Exception:
+        manifest = None
+
+    # Skips what discovery skips, so editor temporary files and the output written into a watched
+    # directory do not trigger rebuilds
+    patterns = discover.IGNORE_PATTERNS + (manifest.ignore if manifest is not None else [])
+    skip: Callable[[str], bool] = lambda name: discover.is_ignored(name, patterns)
+
+    for d in watched_paths(path, manifest):
+        if d.is_file():
+            st = d.stat()
+            snapshot[d] = (st.st_mtime_ns, st.st_size)
+        elif d.is_dir():
+            snapshot.update((f, (st.st_mtime_ns, st.st_size)) for f, st in walk_files(d, skip))
+
+    return snapshot
+
+def watched_paths(path: Path, manifest: Optional[site_manifest.SiteManifest]) -> List[Path]:
+    mpath = path / site_manifest.FILE_NAME
+    paths = [mpath]
+
+    if manifest is not None:
+        paths.extend(path / d for d in manifest.templates + manifest.pages + manifest.assets)
+
+    return paths
+
+def __rebuild(path: Path, options: BuildOptions, session: BuildSession, log: Log, changed: Optional[Set[Path]]) -> None:
+    start = time.perf_counter()
+
+    try:
+        ok = compile_wobsite(path, options, session)
+    except Exception as e:
+        log.err(f"Compilation raised {e!r}")
+        ok = False
+
+    elapsed = (time.perf_counter() - start) * 1000
+    status = "successful" if ok else "failed"
+
+    if changed is None:
+        log.info(f"Initial build {status} in {elapsed:.1f} ms")
+    else:
+        log.info(f"Rebuild after {len(changed)} changed file(s) {status} in {elapsed:.1f} ms")